@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from crawler import crawl_graph, from_edges
+from incremental import IncrementalPageRank
+from pagerank import (DAMPING, SOLVERS, crawl, iterate_pagerank,
+                      sample_pagerank)
+from solvers import (TopK, personalized_iteration, power_iteration,
+                     top_pages)
+
+# Tolerance of the power iteration used as the exact solution
+EXACT_TOLERANCE = 1e-14
+
+# Teleport vectors ranked together by the personalized benchmark
+PERSONALIZED = 16
+
+# Links added and removed by the incremental benchmark's diff
+INCREMENTAL_LINKS = 10
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks for the PageRank engines. Prints one JSON "
+                    "object per measurement.")
+    parser.add_argument("--pages", default="100,1000,10000",
+                        help="comma-separated synthetic corpus sizes")
+    parser.add_argument("--links", type=float, default=8,
+                        help="average number of links per page")
+    parser.add_argument("--exponent", type=float, default=2.1,
+                        help="power-law exponent of the link degrees")
+    parser.add_argument("--samples", default="1000,10000,100000",
+                        help="comma-separated sample counts for the samplers")
+    parser.add_argument("--max-pages-slow", type=int, default=1000,
+                        help="largest corpus to run the dictionary based "
+                             "sampler and sweep on")
+    parser.add_argument("--max-pages-crawl", type=int, default=10000,
+                        help="largest corpus to write out as HTML and crawl")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of pages found by the top-k solver")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the graph generator and samplers")
+    parser.add_argument("--output", metavar="FILE",
+                        help="append results to FILE instead of printing them")
+    args = parser.parse_args()
+
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for n in [int(size) for size in args.pages.split(",")]:
+            graph = power_law_graph(n, args.links, args.exponent, args.seed)
+            for result in benchmark(graph, args):
+                result.update(pages=n, links=len(graph.targets))
+                print(json.dumps(result), file=output, flush=True)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def benchmark(graph, args):
+    """
+    Yield one result dictionary for every engine run on `graph`.
+    """
+    n = len(graph)
+    exact, _ = exact_pagerank(graph)
+    slow = n <= args.max_pages_slow
+
+    if n <= args.max_pages_crawl:
+        with tempfile.TemporaryDirectory() as directory:
+            write_corpus(graph, directory)
+            yield time_crawl("serial", crawl, directory)
+            yield time_crawl("parallel", crawl_graph, directory)
+
+    corpus = graph.to_corpus() if slow else None
+    for samples in [int(count) for count in args.samples.split(",")]:
+        for sampler in ["transition", "table", "parallel"]:
+            if sampler == "transition" and not slow:
+                continue
+            random.seed(args.seed)
+            start = time.perf_counter()
+            ranks = sample_pagerank(corpus if sampler == "transition"
+                                    else graph, DAMPING, samples, sampler,
+                                    seed=args.seed)
+            seconds = time.perf_counter() - start
+            yield {
+                "benchmark": "sample",
+                "engine": sampler,
+                "samples": samples,
+                "seconds": seconds,
+                "l1_error": l1_error(graph, ranks, exact),
+            }
+
+    for solver in SOLVERS:
+        if solver == "sweep" and not slow:
+            continue
+        residuals = []
+        start = time.perf_counter()
+        ranks = iterate_pagerank(corpus if solver == "sweep" else graph,
+                                 DAMPING, solver,
+                                 monitor=recorder(residuals))
+        seconds = time.perf_counter() - start
+        yield iteration_result(solver, seconds, residuals,
+                               l1_error(graph, ranks, exact))
+
+    # Power iteration stopped once the top pages are known, checked
+    # against the exact top pages
+    residuals = []
+    start = time.perf_counter()
+    ranks, _ = power_iteration(
+        graph, DAMPING,
+        convergence=TopK(args.top, DAMPING, monitor=recorder(residuals)))
+    seconds = time.perf_counter() - start
+    result = iteration_result("top", seconds, residuals,
+                              l1_error(graph, ranks, exact))
+    result["k"] = args.top
+    result["top_correct"] = bool(
+        (top_pages(ranks, args.top) == top_pages(exact, args.top)).all())
+    yield result
+
+    # Personalized ranks for a uniform column, compared with the exact
+    # solution, and single-page columns ranked alongside it
+    rng = np.random.default_rng(args.seed)
+    teleports = np.zeros((n, PERSONALIZED))
+    teleports[:, 0] = 1 / n
+    teleports[rng.integers(0, n, PERSONALIZED - 1),
+              np.arange(1, PERSONALIZED)] = 1
+    residuals = []
+    start = time.perf_counter()
+    ranks, _ = personalized_iteration(graph, DAMPING, teleports,
+                                      monitor=recorder(residuals))
+    seconds = time.perf_counter() - start
+    result = iteration_result("personalized", seconds, residuals,
+                              float(np.abs(ranks[:, 0] - exact).sum()))
+    result["vectors"] = PERSONALIZED
+    yield result
+
+    yield incremental_result(graph, args.seed)
+
+
+def incremental_result(graph, seed=0):
+    """
+    Returns the result of re-ranking `graph` after a small random diff
+    with IncrementalPageRank: one page added and one removed, and
+    INCREMENTAL_LINKS links added and as many removed. The warm-started
+    update is timed against a cold solve of the changed graph.
+    """
+    rng = np.random.default_rng(seed)
+    ranker = IncrementalPageRank(graph, DAMPING)
+    pages = graph.pages
+    n = len(pages)
+
+    def pick(count):
+        return [pages[i] for i in rng.integers(0, n, count)]
+
+    removed_links = []
+    for source in pick(INCREMENTAL_LINKS):
+        links = sorted(ranker.corpus[source])
+        if links:
+            removed_links.append((source, links[rng.integers(len(links))]))
+    diff = {
+        "added_pages": {"new.html": set(pick(INCREMENTAL_LINKS))},
+        "removed_pages": pick(1),
+        "added_links": list(zip(pick(INCREMENTAL_LINKS),
+                                pick(INCREMENTAL_LINKS))),
+        "removed_links": removed_links,
+    }
+
+    start = time.perf_counter()
+    update = ranker.update(**diff)
+    seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    _, cold_iterations = power_iteration(ranker.graph, DAMPING)
+    cold_seconds = time.perf_counter() - start
+    return {
+        "benchmark": "incremental",
+        "engine": "warm",
+        "seconds": seconds,
+        "iterations": update["iterations"],
+        "cold_seconds": cold_seconds,
+        "cold_iterations": cold_iterations,
+    }
+
+
+def power_law_graph(n, links, exponent, seed=0):
+    """
+    Returns a random LinkGraph of `n` pages whose out-degrees follow a
+    power law with the given `exponent` and mean of about `links`, and
+    whose link targets are drawn from power-law page popularities, so
+    that in-degrees are heavy tailed too. Some pages get no links.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Pareto out-degrees rescaled to the requested mean, capped at n - 1
+    degrees = rng.pareto(exponent - 1, n) + 1
+    degrees = np.round(degrees * links / degrees.mean())
+    out_degree = np.minimum(degrees, n - 1).astype(np.int64)
+
+    popularity = rng.pareto(exponent - 1, n) + 1
+    popularity /= popularity.sum()
+    sources = np.repeat(np.arange(n, dtype=np.int64), out_degree)
+    targets = rng.choice(n, size=len(sources), p=popularity)
+
+    # Drop self links and duplicate links
+    keep = sources != targets
+    edges = np.unique(np.stack([sources[keep], targets[keep]]), axis=1)
+    pages = [f"{i}.html" for i in range(n)]
+    return from_edges(pages, edges[0], edges[1])
+
+
+def write_corpus(graph, directory):
+    """
+    Write every page of `graph` to `directory` as an HTML file linking
+    to the pages it links to.
+    """
+    for i, page in enumerate(graph.pages):
+        links = graph.targets[graph.offsets[i]:graph.offsets[i + 1]]
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title>"
+                    "</head>\n<body>\n")
+            for j in links:
+                f.write(f'<a href="{graph.pages[j]}">{graph.pages[j]}</a>\n')
+            f.write("</body>\n</html>\n")
+
+
+def time_crawl(engine, function, directory):
+    """
+    Returns the result of timing one crawler over `directory`.
+    """
+    start = time.perf_counter()
+    function(directory)
+    return {
+        "benchmark": "crawl",
+        "engine": engine,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def exact_pagerank(graph):
+    """
+    Returns PageRank of `graph` solved to EXACT_TOLERANCE, the reference
+    the other engines are measured against, and its iteration count.
+    """
+    return power_iteration(graph, DAMPING, EXACT_TOLERANCE,
+                           max_iterations=100000)
+
+
+def l1_error(graph, ranks, exact):
+    """
+    Returns the L1 distance between a page -> rank dictionary and the
+    exact rank vector.
+    """
+    if isinstance(ranks, dict):
+        ranks = np.array([ranks[page] for page in graph.pages])
+    return float(np.abs(ranks - exact).sum())
+
+
+def recorder(residuals):
+    """
+    Returns a solver monitor that appends each residual to `residuals`.
+    """
+    def monitor(iteration, residual):
+        residuals.append(float(residual))
+    return monitor
+
+
+def iteration_result(engine, seconds, residuals, error):
+    """
+    Returns the result of one iterative solve.
+    """
+    return {
+        "benchmark": "iterate",
+        "engine": engine,
+        "seconds": seconds,
+        "iterations": len(residuals),
+        "residuals": residuals,
+        "l1_error": error,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import posixpath
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from graph import LinkGraph
+
+# Bytes of HTML fed to the parser at a time
+CHUNK_SIZE = 1 << 16
+
+
+class LinkExtractor(HTMLParser):
+    """
+    Collects the href of every <a> tag fed to it.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.links.add(value)
+
+
+def crawl_graph(directory, workers=None, processes=False):
+    """
+    Parse every HTML page below `directory`, including subdirectories,
+    and return their links as a LinkGraph.
+
+    Pages are named by their path relative to `directory`, using "/"
+    separators. Files are parsed concurrently by `workers` threads, or
+    processes if `processes` is true. Each file is fed to the parser in
+    CHUNK_SIZE pieces, so whole documents are never held in memory.
+    Self links and links to pages outside the corpus are dropped.
+    """
+    pages = sorted(find_pages(directory))
+    index = {page: i for i, page in enumerate(pages)}
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+
+    sources = []
+    targets = []
+    with executor(workers) as pool:
+        jobs = [(directory, page) for page in pages]
+        for i, links in enumerate(pool.map(page_links, jobs, chunksize=64)):
+            linked = sorted({index[link] for link in links if link in index}
+                            - {i})
+            sources.extend([i] * len(linked))
+            targets.extend(linked)
+    return from_edges(pages, sources, targets)
+
+
+def find_pages(directory):
+    """
+    Yield the relative path of every .html file below `directory`.
+    """
+    for root, _, filenames in os.walk(directory):
+        relative = os.path.relpath(root, directory)
+        for filename in filenames:
+            if filename.endswith(".html"):
+                path = os.path.normpath(os.path.join(relative, filename))
+                yield path.replace(os.sep, "/")
+
+
+def page_links(job):
+    """
+    Returns the set of corpus-relative paths linked to by one page.
+    """
+    directory, page = job
+    parser = LinkExtractor()
+    with open(os.path.join(directory, page), encoding="utf-8",
+              errors="replace") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    parser.close()
+
+    links = set()
+    for href in parser.links:
+        link = resolve(page, href)
+        if link is not None:
+            links.add(link)
+    return links
+
+
+def resolve(page, href):
+    """
+    Resolve `href`, found on `page`, to a corpus-relative path.
+    Returns None for links that cannot point into the corpus, such as
+    absolute URLs, fragments or links above the corpus root.
+    """
+    parts = urlsplit(href)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    if parts.path.startswith("/"):
+        path = parts.path.lstrip("/")
+    else:
+        path = posixpath.join(posixpath.dirname(page), parts.path)
+    path = posixpath.normpath(path)
+    if path.startswith("../") or path == "..":
+        return None
+    return path
+
+
+def from_edges(pages, sources, targets):
+    """
+    Build a LinkGraph from parallel `sources` and `targets` edge arrays.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    order = np.lexsort((targets, sources))
+    offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(pages)), out=offsets[1:])
+    return LinkGraph(list(pages), offsets, targets[order])
+
+
+def save_edges(graph, path):
+    """
+    Write the pages and links of `graph` to `path` as a compressed
+    edge list.
+    """
+    sources = np.repeat(np.arange(len(graph), dtype=np.int32),
+                        graph.out_degree)
+    np.savez_compressed(path, pages=np.array(graph.pages, dtype=str),
+                        sources=sources,
+                        targets=graph.targets.astype(np.int32))
+
+
+def load_edges(path):
+    """
+    Read an edge list written by `save_edges` back into a LinkGraph.
+    """
+    with np.load(path) as data:
+        return from_edges(data["pages"].tolist(), data["sources"],
+                          data["targets"])
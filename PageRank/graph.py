@@ -0,0 +1,229 @@
+import json
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+# Name and format version of the metadata file of an on-disk index
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+
+# Arrays stored in an index, one .npy file each
+INDEX_ARRAYS = ["offsets", "targets", "in_offsets", "in_sources"]
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus as integer arrays.
+
+    Pages are numbered 0..n-1 in the order of `pages`. The pages linked
+    to by page `i` are `targets[offsets[i]:offsets[i + 1]]`, and the
+    same links are also kept transposed: the pages linking to page `j`
+    are `in_sources[in_offsets[j]:in_offsets[j + 1]]`.
+    """
+
+    def __init__(self, pages, offsets, targets, in_offsets=None,
+                 in_sources=None, path=None):
+        self.pages = pages
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.out_degree = np.diff(self.offsets)
+        self.dangling = self.out_degree == 0
+
+        # Transposed CSR, grouping links by their target page
+        n = len(pages)
+        if in_offsets is None:
+            sources = np.repeat(np.arange(n, dtype=np.int64), self.out_degree)
+            order = np.argsort(self.targets, kind="stable")
+            in_sources = sources[order]
+            in_offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.targets, minlength=n),
+                      out=in_offsets[1:])
+        self.in_sources = np.asarray(in_sources, dtype=np.int64)
+        self.in_offsets = np.asarray(in_offsets, dtype=np.int64)
+        self.in_degree = np.diff(self.in_offsets)
+
+        # Index directory the arrays are memory-mapped from, if any
+        self.path = path
+
+    def __reduce__(self):
+        # Memory-mapped graphs are reopened rather than copied when
+        # sent to another process
+        if self.path is not None:
+            return (LinkGraph.load, (self.path,))
+        return (LinkGraph, (self.pages, self.offsets, self.targets,
+                            self.in_offsets, self.in_sources))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Open an index written by `save`, memory-mapping its arrays.
+        """
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_VERSION:
+            raise ValueError(f"{path} has unsupported index version "
+                             f"{meta['version']}")
+        with open(os.path.join(path, "pages.txt"), encoding="utf-8") as f:
+            pages = f.read().split("\n")[:meta["pages"]]
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in INDEX_ARRAYS
+        }
+        return cls(pages, path=path, **arrays)
+
+    def save(self, path):
+        """
+        Write the graph to the directory `path` as an index: a page id
+        table in pages.txt and one .npy file per CSR array, which
+        `load` memory-maps instead of reading.
+        """
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "pages.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(self.pages))
+        for name in INDEX_ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, INDEX_FILE), "w") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "pages": len(self.pages),
+                "links": len(self.targets),
+            }, f)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a `crawl` dictionary mapping each page to
+        the set of pages it links to.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        targets = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in corpus[page])
+            targets.extend(links)
+            offsets[i + 1] = offsets[i] + len(links)
+        return cls(pages, offsets, np.array(targets, dtype=np.int64))
+
+    def with_rows(self, pages, rows):
+        """
+        Returns a graph over `pages`, sorted as in `from_corpus`, in which
+        each page of the `rows` dictionary links to its set of pages and
+        every other page keeps its links from this graph.
+
+        Only the rows in `rows` are built from page names; the others
+        are copied and renumbered as arrays. Pages of this graph not in
+        `pages` are dropped, so every page linking to one must be in
+        `rows`.
+        """
+        n = len(pages)
+        if pages == self.pages:
+            remap = np.arange(n, dtype=np.int64)
+        else:
+            position = {page: i for i, page in enumerate(pages)}
+            remap = np.array([position.get(page, -1) for page in self.pages],
+                             dtype=np.int64)
+        rebuilt = {bisect_left(pages, page): links
+                   for page, links in rows.items()}
+
+        # Old pages whose row is copied as it is
+        kept = remap >= 0
+        kept[kept] = ~np.isin(remap[kept], list(rebuilt))
+
+        degree = np.zeros(n, dtype=np.int64)
+        degree[remap[kept]] = self.out_degree[kept]
+        for i, links in rebuilt.items():
+            degree[i] = len(links)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degree, out=offsets[1:])
+
+        # Move the copied links to their row's new offset
+        targets = np.empty(offsets[-1], dtype=np.int64)
+        sources = np.repeat(np.arange(len(self), dtype=np.int64),
+                            self.out_degree)
+        copied = kept[sources]
+        rows_of = sources[copied]
+        shift = offsets[remap[rows_of]] - self.offsets[rows_of]
+        targets[np.flatnonzero(copied) + shift] = remap[self.targets[copied]]
+
+        for i, links in rebuilt.items():
+            targets[offsets[i]:offsets[i + 1]] = sorted(
+                bisect_left(pages, link) for link in links)
+        return LinkGraph(pages, offsets, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def to_corpus(self):
+        """
+        Returns the graph as a `crawl` style dictionary.
+        """
+        return {
+            page: {
+                self.pages[j]
+                for j in self.targets[self.offsets[i]:self.offsets[i + 1]]
+            }
+            for i, page in enumerate(self.pages)
+        }
+
+    def to_dict(self, ranks):
+        """
+        Returns a dictionary mapping each page name to its entry in the
+        rank vector `ranks`.
+        """
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+    def propagate(self, ranks):
+        """
+        Returns the rank every page receives through its incoming links
+        when each page splits `ranks` evenly between its outgoing links.
+
+        `ranks` may be a vector of n ranks or an (n, k) matrix holding
+        k rank vectors as columns. Dangling pages pass on nothing.
+        """
+        ranks = np.asarray(ranks, dtype=np.float64)
+        received = np.zeros_like(ranks)
+        if len(self.in_sources) == 0:
+            return received
+
+        # Share of each source page sent along one link
+        share = np.zeros_like(ranks)
+        linked = ~self.dangling
+        if ranks.ndim == 1:
+            share[linked] = ranks[linked] / self.out_degree[linked]
+        else:
+            share[linked] = ranks[linked] / self.out_degree[linked, None]
+
+        # Sum the shares arriving at each page with incoming links
+        flows = share[self.in_sources]
+        receiving = self.in_degree > 0
+        received[receiving] = np.add.reduceat(
+            flows, self.in_offsets[:-1][receiving], axis=0
+        )
+        return received
+
+
+def as_graph(corpus):
+    """
+    Returns `corpus` as a LinkGraph, converting a `crawl` dictionary.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    return LinkGraph.from_corpus(corpus)
+
+
+def as_corpus(corpus):
+    """
+    Returns `corpus` as a `crawl` dictionary, converting a LinkGraph.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus.to_corpus()
+    return corpus
+
+
+def is_index(path):
+    """
+    Returns whether `path` is an index directory written by LinkGraph.save.
+    """
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
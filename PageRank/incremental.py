@@ -0,0 +1,124 @@
+from bisect import bisect_left
+
+import numpy as np
+
+from graph import LinkGraph, as_corpus
+from solvers import TOLERANCE, power_iteration
+
+
+class IncrementalPageRank():
+    """
+    Keeps the link structure and ranks of a corpus so that small changes
+    can be ranked by warm-starting from the previous rank vector.
+
+    The first solve starts from the uniform vector and its iteration
+    count is kept as the cold-start baseline that later updates are
+    estimated against.
+    """
+
+    def __init__(self, corpus, damping_factor, tolerance=TOLERANCE):
+        self.damping_factor = damping_factor
+        self.tolerance = tolerance
+        self.corpus = {
+            page: set(links) for page, links in as_corpus(corpus).items()
+        }
+        self.graph = LinkGraph.from_corpus(self.corpus)
+        self.ranks, self.baseline_iterations = power_iteration(
+            self.graph, damping_factor, tolerance)
+
+    def pagerank(self):
+        """
+        Returns the current ranks as a page -> rank dictionary.
+        """
+        return self.graph.to_dict(self.ranks)
+
+    def update(self, added_pages=None, removed_pages=(), added_links=(),
+               removed_links=(), compare=False):
+        """
+        Apply a diff to the corpus and re-rank it from the previous ranks.
+
+        `added_pages` maps new pages to the pages they link to,
+        `removed_pages` lists pages to drop along with every link to
+        them, and `added_links` / `removed_links` are (source, target)
+        pairs. As in `crawl`, self links and links to pages outside the
+        corpus are ignored.
+
+        Only the rows of the link graph whose links changed are rebuilt;
+        the others are copied from the previous graph.
+
+        Returns a dictionary with the warm-start `iterations`. If
+        `compare` is true, it also holds the `cold_iterations` of a solve
+        from the uniform vector on the new corpus and the iterations
+        `saved`; otherwise it holds the `baseline_iterations` of the
+        first solve and `estimated_saved`, measured against that.
+        """
+        removed_pages, changed = self.apply(
+            added_pages or {}, removed_pages, added_links, removed_links)
+        previous = self.graph.to_dict(self.ranks)
+        if removed_pages or not changed.issubset(previous):
+            pages = sorted(self.corpus)
+        else:
+            pages = self.graph.pages
+        self.graph = self.graph.with_rows(
+            pages, {page: self.corpus[page] for page in changed})
+
+        # Keep the ranks of surviving pages, give new pages an even share
+        n = len(self.graph)
+        start = np.array([previous.get(page, 1 / n)
+                          for page in self.graph.pages])
+        start /= start.sum()
+
+        self.ranks, iterations = power_iteration(
+            self.graph, self.damping_factor, self.tolerance, start=start)
+        if not compare:
+            return {
+                "iterations": iterations,
+                "baseline_iterations": self.baseline_iterations,
+                "estimated_saved": self.baseline_iterations - iterations,
+            }
+        _, cold_iterations = power_iteration(
+            self.graph, self.damping_factor, self.tolerance)
+        return {
+            "iterations": iterations,
+            "cold_iterations": cold_iterations,
+            "saved": cold_iterations - iterations,
+        }
+
+    def apply(self, added_pages, removed_pages, added_links, removed_links):
+        """
+        Change the stored corpus according to a diff.
+
+        Returns the pages removed and the set of remaining pages whose
+        links may have changed: pages added or given new or fewer links,
+        and pages that linked to a removed page.
+        """
+        corpus = self.corpus
+        graph = self.graph
+        removed_pages = {page for page in removed_pages if page in corpus}
+        changed = set()
+        for page in removed_pages:
+            del corpus[page]
+            j = bisect_left(graph.pages, page)
+            for i in graph.in_sources[graph.in_offsets[j]:
+                                      graph.in_offsets[j + 1]]:
+                changed.add(graph.pages[i])
+        for page, links in added_pages.items():
+            corpus.setdefault(page, set()).update(links)
+            changed.add(page)
+        for source, target in added_links:
+            if source in corpus:
+                corpus[source].add(target)
+                changed.add(source)
+        for source, target in removed_links:
+            if source in corpus:
+                corpus[source].discard(target)
+                changed.add(source)
+
+        # Only keep links to other pages in the corpus
+        changed = {page for page in changed if page in corpus}
+        for page in changed:
+            corpus[page] = {
+                link for link in corpus[page]
+                if link in corpus and link != page
+            }
+        return removed_pages, changed
@@ -1,26 +1,183 @@
+import argparse
+import json
 import os
 import random
 import re
-import sys
+import warnings
+
+from crawler import crawl_graph, load_edges, save_edges
+from graph import LinkGraph, as_corpus, as_graph, is_index
+from sampling import MAX_TOP_SAMPLES, Sampler, parallel_pagerank, sample_top
+from solvers import (Convergence, TopK, adaptive, extrapolated, gauss_seidel,
+                     personalized_iteration, power_iteration, teleport_matrix,
+                     top_pages)
 
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    parser = argparse.ArgumentParser(description="Rank the pages of a corpus.")
+    parser.add_argument("corpus",
+                        help="directory of HTML pages, an index built "
+                             "with --build-index, or an edge list saved "
+                             "with --save-edges")
+    parser.add_argument("--crawler", choices=["serial", "parallel"],
+                        default="serial",
+                        help="serial reads the top directory only; parallel "
+                             "walks subdirectories with a pool of workers")
+    parser.add_argument("--workers", type=int,
+                        help="threads used by the parallel crawler")
+    parser.add_argument("--save-edges", metavar="FILE",
+                        help="write the crawled links to FILE as an edge list")
+    parser.add_argument("--build-index", metavar="DIR",
+                        help="write the crawled links to DIR as a "
+                             "memory-mapped index and exit")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help="number of pages visited by sample_pagerank")
+    parser.add_argument("--sampler", choices=SAMPLERS, default="transition",
+                        help="method used by sample_pagerank")
+    parser.add_argument("--walkers", type=int, default=8,
+                        help="independent walkers of the parallel sampler")
+    parser.add_argument("--processes", type=int,
+                        help="worker processes of the parallel sampler "
+                             "(default: one per CPU)")
+    parser.add_argument("--solver", choices=SOLVERS, default="sweep",
+                        help="method used by iterate_pagerank")
+    parser.add_argument("--damping", type=float, default=DAMPING,
+                        help="probability of following a link rather than "
+                             "jumping to a random page")
+    parser.add_argument("--top", type=int, metavar="K",
+                        help="only find the K highest ranked pages, "
+                             "stopping as soon as they are known")
+    parser.add_argument("--max-samples", type=int, default=MAX_TOP_SAMPLES,
+                        help="steps --top samples at most before giving "
+                             "up on separating the top pages")
+    parser.add_argument("--personalize", metavar="FILE",
+                        help="JSON file mapping names to teleport weights "
+                             "({page: weight}) or page lists; prints one "
+                             "personalized ranking per name")
+    args = parser.parse_args()
+
+    if is_index(args.corpus):
+        corpus = LinkGraph.load(args.corpus)
+    elif args.corpus.endswith(".npz"):
+        corpus = load_edges(args.corpus)
+    elif args.crawler == "parallel":
+        corpus = crawl_graph(args.corpus, args.workers)
+    else:
+        corpus = crawl(args.corpus)
+    if args.save_edges:
+        save_edges(as_graph(corpus), args.save_edges)
+    if args.build_index:
+        as_graph(corpus).save(args.build_index)
+        print(f"Index of {len(corpus)} pages written to {args.build_index}.")
+        return
+
+    if args.personalize:
+        with open(args.personalize) as f:
+            teleports = json.load(f)
+        try:
+            personalized = personalized_pagerank(corpus, args.damping,
+                                                 teleports)
+        except ValueError as e:
+            parser.error(str(e))
+        for name, ranks in personalized.items():
+            print(f"Personalized PageRank Results for {name}")
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f}")
+        return
+
+    if args.top:
+        solver = "power" if args.solver == "sweep" else args.solver
+        print(f"Top {args.top} Pages from Sampling")
+        print_top(top_pagerank(corpus, args.damping, args.top,
+                               samples=args.samples,
+                               max_samples=args.max_samples))
+        print(f"Top {args.top} Pages from Iteration")
+        print_top(top_pagerank(corpus, args.damping, args.top, solver))
+        return
+
+    if args.sampler == "parallel":
+        graph = as_graph(corpus)
+        ranks, errors = parallel_pagerank(graph, args.damping, args.samples,
+                                          args.walkers, args.processes)
+        walkers = max(1, min(args.walkers, args.samples))
+        print(f"PageRank Results from Sampling (n = {args.samples}, "
+              f"{walkers} walkers, 95% confidence)")
+        for page, rank, error in sorted(zip(graph.pages, ranks, errors)):
+            print(f"  {page}: {rank:.4f} ± {error:.4f}")
+    else:
+        ranks = sample_pagerank(corpus, args.damping, args.samples,
+                                args.sampler)
+        print(f"PageRank Results from Sampling (n = {args.samples})")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+    ranks = iterate_pagerank(corpus, args.damping, args.solver)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
 
+def personalized_pagerank(corpus, damping_factor, teleports):
+    """
+    Return personalized PageRank values for several teleport
+    distributions, computed together in one batched iteration.
+
+    `teleports` maps a name, such as a user or topic, to either a
+    dictionary of page weights or a list of pages to weight equally.
+    Return a dictionary mapping each name to a dictionary of page
+    names and their PageRank values under that distribution.
+    """
+    graph = as_graph(corpus)
+    names = list(teleports)
+    distributions = [
+        weights if isinstance(weights, dict)
+        else {page: 1 for page in weights}
+        for weights in teleports.values()
+    ]
+    ranks, _ = personalized_iteration(
+        graph, damping_factor, teleport_matrix(graph, distributions, names))
+    return {
+        name: graph.to_dict(ranks[:, j]) for j, name in enumerate(names)
+    }
+
+
+def top_pagerank(corpus, damping_factor, k, solver="power", samples=None,
+                 max_samples=MAX_TOP_SAMPLES):
+    """
+    Return the `k` pages with the highest PageRank, highest first, as
+    a list of (page, rank) pairs.
+
+    Iterates with `solver`, one of the LinkGraph solvers in SOLVERS,
+    only until the order of the top k pages can no longer change. If
+    `samples` is given, samples instead in rounds of that many steps
+    until the top k pages are separated from the rest at 95% confidence,
+    or `max_samples` steps were taken; in that case, as when pages tie
+    at the boundary, a warning is issued and the best estimate returned.
+    """
+    graph = as_graph(corpus)
+    if samples:
+        top, ranks, _, total, resolved = sample_top(
+            graph, damping_factor, k, samples, max_samples=max_samples)
+        if not resolved:
+            warnings.warn(f"top {k} pages not separated after {total} "
+                          f"samples; ranking is a best estimate")
+    else:
+        ranks, _ = ITERATIVE_SOLVERS[solver](
+            graph, damping_factor, convergence=TopK(k, damping_factor))
+        top = top_pages(ranks, k)
+    return [(graph.pages[i], float(ranks[i])) for i in top]
+
+
+def print_top(ranking):
+    """
+    Print a top_pagerank list, one numbered page per line.
+    """
+    for position, (page, rank) in enumerate(ranking, 1):
+        print(f"  {position}. {page}: {rank:.4f}")
+
+
 def crawl(directory):
     """
     Parse a directory of HTML pages and check for links to other pages.
@@ -47,26 +204,32 @@ def crawl(directory):
 
     return pages
 
-def transition_model(corpus, page, damping_factor):
+def transition_model(corpus, page, damping_factor, teleport=None):
     """
     Return a probability distribution over which page to visit next,
     given a current page.
 
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
-    a link at random chosen from all pages in the corpus.
+    a link at random chosen from all pages in the corpus, or according
+    to the `teleport` distribution (page -> probability) if given.
+    A page with no links always jumps.
     """
+    if teleport is None:
+        teleport = {i: 1 / len(corpus) for i in corpus}
+    if len(corpus[page]) == 0:
+        return {i: teleport.get(i, 0) for i in corpus}
+
     page_probability = {}
-    random_jumping = (1 - damping_factor) / len(corpus)
 
     for i in corpus:
-        page_probability.update({i : random_jumping})         #iterate through corpus to update the dictionary with all the pages. Add the random jumping probability to each page
+        page_probability.update({i : (1 - damping_factor) * teleport.get(i, 0)})         #iterate through corpus to update the dictionary with all the pages. Add the random jumping probability to each page
 
     if len(corpus[page]) > 0:                                   # if the page has outgoing links
-        link_probability = 0.85 / len(corpus[page])
+        link_probability = damping_factor / len(corpus[page])
         
         for links in corpus.get(page):
-            page_probability.update({links : random_jumping + link_probability})    #iterate through the links in the page. For each link, update the dictionary of the key to jumping_probability + link_probability
+            page_probability[links] += link_probability    #iterate through the links in the page. For each link, update the dictionary of the key to jumping_probability + link_probability
 
     sum = 0                                                     # make sure that the probability adds up to 1
     for pages, value in page_probability.items():
@@ -75,15 +238,32 @@ def transition_model(corpus, page, damping_factor):
     return page_probability
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, sampler="transition",
+                    seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
 
+    `sampler` is one of SAMPLERS: "transition" builds the transition
+    model for every step, "table" draws each step in constant time from
+    the link arrays of a LinkGraph, moving many surfers at once, and
+    "parallel" runs independent walkers across a process pool. `seed`
+    seeds the "table" and "parallel" samplers; "transition" draws from
+    the `random` module.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
+    if sampler == "table":
+        graph = as_graph(corpus)
+        return graph.to_dict(Sampler(graph, damping_factor, seed).pagerank(n))
+    if sampler == "parallel":
+        graph = as_graph(corpus)
+        ranks, _ = parallel_pagerank(graph, damping_factor, n, seed=seed)
+        return graph.to_dict(ranks)
+    corpus = as_corpus(corpus)
+
     page_rank = {}  
     current_page = random.choice(list(corpus))              #choose the first page from random. The first page is not counted into the rank.
 
@@ -110,15 +290,32 @@ def sample_pagerank(corpus, damping_factor, n):
         #raise ValueError("PageRank does not add up to 1")
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, solver="sweep", monitor=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
+    `solver` is one of SOLVERS: "sweep" updates one page at a time
+    from the corpus dictionary; the others work on a sparse LinkGraph
+    until the L1 change is below tolerance. "power" runs vectorized
+    power iteration, "gauss-seidel" block Gauss-Seidel sweeps,
+    "quadratic" power iteration accelerated by quadratic
+    extrapolation, and "adaptive" power iteration that stops updating
+    converged pages. If given, `monitor(iteration, residual)` is called
+    after every iteration, or every full sweep, with the L1 change it
+    made.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
+    if solver != "sweep":
+        graph = as_graph(corpus)
+        ranks, _ = ITERATIVE_SOLVERS[solver](
+            graph, damping_factor, convergence=Convergence(monitor=monitor))
+        return graph.to_dict(ranks)
+    corpus = as_corpus(corpus)
+
     page_rank = {}  
     current_page = random.choice(list(corpus))              #choose the first page from random. The first page is not counted into the rank.
     N = len(corpus)
@@ -128,8 +325,10 @@ def iterate_pagerank(corpus, damping_factor):
     
     d = damping_factor
     counter = 0
+    sweeps = 0
 
     while counter < N:                                      #loop while counter is less than the number of websites.
+        residual = 0                                        #L1 change made by this sweep, reported to monitor
         for p in page_rank:                                 #loop through all the pages in page_rank
             temp = 0                                        #temporary storage for the "sum" part of the equation
             for i, value in corpus.items():                 #search for each page that links to p
@@ -142,12 +341,32 @@ def iterate_pagerank(corpus, damping_factor):
             PR = ((1 - d) / N) + (d * (temp))               #finish the rest of the pagerank formula
             
             difference = abs(PR - page_rank[p])             #check if the pagerank converges and the difference is less than 1
+            residual += difference
             if difference < 0.001:                          #update counter, so that upon converging, the loop stops.
                 counter += 1
             else:
                 counter = 0
             page_rank.update({p : PR})
+        sweeps += 1
+        if monitor is not None:
+            monitor(sweeps, residual)
     return page_rank
 
+# Methods selectable for sample_pagerank
+SAMPLERS = ["transition", "table", "parallel"]
+
+# Solvers over a LinkGraph, each taking a graph, a damping factor and
+# a Convergence
+ITERATIVE_SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "quadratic": extrapolated,
+    "adaptive": adaptive,
+}
+
+# Methods selectable for iterate_pagerank
+SOLVERS = ["sweep"] + list(ITERATIVE_SOLVERS)
+
+
 if __name__ == "__main__":
     main()
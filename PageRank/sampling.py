@@ -0,0 +1,193 @@
+import multiprocessing
+
+import numpy as np
+
+from solvers import top_pages
+
+# Fewest steps each walker takes before more walkers are added
+MIN_STEPS = 1000
+
+# Most walkers moved together in one vectorized step
+MAX_WALKERS = 10000
+
+# Normal quantile for 95% confidence intervals
+Z_95 = 1.959964
+
+# Positions buffered before they are added to the visit counts
+BLOCK = 1 << 20
+
+# Steps sample_top takes at most before giving up on separating the top
+MAX_TOP_SAMPLES = 1000000
+
+
+class Sampler():
+    """
+    Random surfers over a LinkGraph, each step taking constant time.
+
+    The transition model is a mixture: with probability `damping_factor`
+    follow one of the current page's links, chosen uniformly, otherwise
+    jump to a page chosen uniformly from the corpus. Dangling pages
+    always jump. Both parts are uniform, so the CSR link arrays already
+    are the per-page sampling tables: a link is picked by indexing
+    `targets` at a random offset, without building any distribution.
+    """
+
+    def __init__(self, graph, damping_factor, seed=None):
+        self.graph = graph
+        self.damping_factor = damping_factor
+        self.rng = np.random.default_rng(seed)
+
+    def step(self, pages):
+        """
+        Returns the next page of a surfer at each page in `pages`.
+        """
+        graph = self.graph
+        n = len(pages)
+        following = ((self.rng.random(n) < self.damping_factor)
+                     & ~graph.dangling[pages])
+        next_pages = self.rng.integers(0, len(graph), size=n)
+
+        movers = pages[following]
+        degree = graph.out_degree[movers]
+        choice = (self.rng.random(len(movers)) * degree).astype(np.int64)
+        next_pages[following] = graph.targets[graph.offsets[movers] + choice]
+        return next_pages
+
+    def visits(self, samples, walkers=None):
+        """
+        Run surfers for `samples` steps in total, each starting on a
+        random page, and return how often every page was visited. The
+        starting pages are not counted.
+
+        The steps are split between `walkers` surfers moved together,
+        by default as many as allow MIN_STEPS steps each.
+        """
+        if walkers is None:
+            walkers = max(1, min(MAX_WALKERS, samples // MIN_STEPS))
+        walkers = max(1, min(walkers, samples))
+        counts = np.zeros(len(self.graph), dtype=np.int64)
+        pages = self.rng.integers(0, len(self.graph), size=walkers)
+
+        buffer = []
+        buffered = 0
+        remaining = samples
+        while remaining > 0:
+            if remaining < len(pages):
+                pages = pages[:remaining]
+            pages = self.step(pages)
+            buffer.append(pages)
+            buffered += len(pages)
+            remaining -= len(pages)
+            if buffered >= BLOCK:
+                counts += np.bincount(np.concatenate(buffer),
+                                      minlength=len(self.graph))
+                buffer = []
+                buffered = 0
+        if buffer:
+            counts += np.bincount(np.concatenate(buffer),
+                                  minlength=len(self.graph))
+        return counts
+
+    def pagerank(self, samples, walkers=None):
+        """
+        Returns the estimated PageRank vector from `samples` steps.
+        """
+        return self.visits(samples, walkers) / samples
+
+
+def sample_top(graph, damping_factor, k, samples, walkers=8,
+               max_samples=MAX_TOP_SAMPLES, seed=None):
+    """
+    Estimate the `k` pages with the highest PageRank by sampling in
+    rounds of `samples` steps, split between `walkers` independent
+    surfers, until the top k set is statistically separated: the lower
+    end of every top page's 95% confidence interval lies above the
+    upper end of every other page's. Stops after `max_samples` steps
+    in total even if the set is not separated, as it never is when
+    pages tie at the boundary.
+
+    Returns the top pages' indexes, highest first, the rank estimate
+    and confidence half-widths of all pages, the samples taken and
+    whether the set was separated.
+    """
+    walkers = min(walkers, samples)
+    if walkers < 2:
+        raise ValueError("confidence intervals need at least 2 walkers, "
+                         "each taking at least one step per round")
+    samplers = [Sampler(graph, damping_factor, child)
+                for child in np.random.SeedSequence(seed).spawn(walkers)]
+    shares = [samples // walkers + (i < samples % walkers)
+              for i in range(walkers)]
+    counts = np.zeros((walkers, len(graph)), dtype=np.int64)
+    taken = np.zeros(walkers, dtype=np.int64)
+    k = min(k, len(graph))
+    while True:
+        for i, sampler in enumerate(samplers):
+            counts[i] += sampler.visits(shares[i])
+            taken[i] += shares[i]
+        ranks, errors = merge(counts, taken)
+        top = top_pages(ranks, k)
+        upper = ranks + errors
+        upper[top] = -np.inf
+        lowest = (ranks[top] - errors[top]).min()
+        total = int(taken.sum())
+        resolved = bool(lowest > upper.max())
+        if resolved or total >= max_samples:
+            return top, ranks, errors, total, resolved
+
+
+def parallel_pagerank(graph, damping_factor, samples, walkers=8,
+                      processes=None, seed=None):
+    """
+    Estimate PageRank with `walkers` independent samplers spread over a
+    pool of `processes`, splitting `samples` steps between them.
+
+    Every walker gets its own random stream spawned from `seed`, so runs
+    are reproducible whatever the number of processes. Returns the
+    merged rank estimate and the half-width of a 95% confidence interval
+    for each page, from the spread of the walkers' own estimates. There
+    are never more walkers than steps, so every walker takes at least
+    one.
+    """
+    walkers = max(1, min(walkers, samples))
+    shares = [samples // walkers + (i < samples % walkers)
+              for i in range(walkers)]
+    seeds = np.random.SeedSequence(seed).spawn(walkers)
+    with multiprocessing.Pool(processes, initializer=init_worker,
+                              initargs=(graph, damping_factor)) as pool:
+        counts = pool.map(walk, zip(shares, seeds))
+    return merge(counts, shares)
+
+
+def merge(counts, shares):
+    """
+    Combine the visit counts of walkers that took `shares` steps each.
+    Returns the rank estimate and 95% confidence half-widths.
+    """
+    counts = np.array(counts, dtype=np.float64)
+    shares = np.array(shares, dtype=np.float64)
+    ranks = counts.sum(axis=0) / shares.sum()
+    if len(shares) < 2:
+        return ranks, np.full_like(ranks, np.inf)
+    estimates = counts / shares[:, None]
+    error = estimates.std(axis=0, ddof=1) / np.sqrt(len(shares))
+    return ranks, Z_95 * error
+
+
+# Graph and damping factor of a pool worker, set by init_worker
+worker_graph = None
+worker_damping = None
+
+
+def init_worker(graph, damping_factor):
+    global worker_graph, worker_damping
+    worker_graph = graph
+    worker_damping = damping_factor
+
+
+def walk(job):
+    """
+    Returns the visit counts of one walker taking `samples` steps.
+    """
+    samples, seed = job
+    return Sampler(worker_graph, worker_damping, seed).visits(samples)
@@ -0,0 +1,394 @@
+import numpy as np
+
+# Default L1 distance between successive rank vectors at which to stop
+TOLERANCE = 1e-8
+
+# Default limit on the number of iterations
+MAX_ITERATIONS = 1000
+
+# Blocks of consecutive pages updated in turn by one Gauss-Seidel sweep
+GAUSS_SEIDEL_BLOCKS = 256
+
+# Power iterations between two extrapolation steps
+EXTRAPOLATION_INTERVAL = 10
+
+# Iterations between two full power steps of the adaptive solver, each
+# checking every page for convergence
+ADAPTIVE_INTERVAL = 5
+
+# Full steps in a row a page must stay converged in before it is frozen
+ADAPTIVE_CHECKS = 2
+
+# Links downstream of a moving page within which no page is frozen
+ADAPTIVE_REACH = 3
+
+
+class Convergence():
+    """
+    Stopping rule shared by the iterative solvers.
+
+    A solver reports the L1 change of every iteration, along with the
+    new ranks, to `converged`, which passes it on to
+    `monitor(iteration, residual)` if one is set and tells the solver
+    to stop once the change drops below `tolerance`. Solvers never run
+    more than `max_iterations`.
+    """
+
+    def __init__(self, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                 monitor=None):
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.monitor = monitor
+
+    def iterations(self):
+        return range(1, self.max_iterations + 1)
+
+    def converged(self, iteration, residual, ranks=None):
+        if self.monitor is not None:
+            self.monitor(iteration, residual)
+        return residual < self.tolerance
+
+
+class TopK(Convergence):
+    """
+    Convergence that also stops as soon as the order of the `k` highest
+    ranked pages, and which pages they are, can no longer change.
+
+    After a power step with L1 change r, the ranks are within
+    d / (1 - d) * r of PageRank in L1 distance, and as both sum to 1
+    no single page is off by more than half of that. Two pages whose
+    ranks differ by more than the whole bound are therefore already in
+    their final order. The bound holds for power iteration and for the
+    extrapolated solvers, whose residuals come from power steps; for
+    the other solvers it is a heuristic.
+    """
+
+    def __init__(self, k, damping_factor, tolerance=TOLERANCE,
+                 max_iterations=MAX_ITERATIONS, monitor=None):
+        super().__init__(tolerance, max_iterations, monitor)
+        self.k = k
+        self.damping_factor = damping_factor
+
+    def converged(self, iteration, residual, ranks=None):
+        if super().converged(iteration, residual, ranks):
+            return True
+        if ranks is None:
+            return False
+        bound = self.damping_factor / (1 - self.damping_factor) * residual
+        top = ranks[top_pages(ranks, self.k + 1)]
+        return bool((-np.diff(top) > bound).all())
+
+
+def top_pages(ranks, k):
+    """
+    Returns the indexes of the `k` highest `ranks`, highest first.
+    """
+    if k >= len(ranks):
+        return np.argsort(-ranks, kind="stable")
+    top = np.argpartition(-ranks, k - 1)[:k]
+    return top[np.argsort(-ranks[top], kind="stable")]
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, start=None, monitor=None,
+                    convergence=None):
+    """
+    Compute PageRank over a LinkGraph by power iteration.
+
+    Each step follows every link with probability `damping_factor`,
+    spreads the rank of dangling pages evenly over all pages as a
+    rank-one correction, and adds the uniform teleport term. Iteration
+    stops once the L1 distance between successive vectors drops below
+    `tolerance`, starting from `start` or the uniform vector. If given,
+    `monitor(iteration, residual)` is called after every iteration.
+    A Convergence passed as `convergence` replaces all three settings.
+
+    Return the rank vector and the number of iterations taken.
+    """
+    if convergence is None:
+        convergence = Convergence(tolerance, max_iterations, monitor)
+    n = len(graph)
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, float)
+    for iteration in convergence.iterations():
+        new_ranks = step(graph, damping_factor, ranks)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if convergence.converged(iteration, residual, ranks):
+            break
+    return ranks, iteration
+
+
+def step(graph, damping_factor, ranks):
+    """
+    Apply one PageRank update to `ranks`.
+    """
+    n = len(graph)
+    dangling = ranks[graph.dangling].sum()
+    return (damping_factor * (graph.propagate(ranks) + dangling / n)
+            + (1 - damping_factor) / n)
+
+
+def personalized_iteration(graph, damping_factor, teleports,
+                           tolerance=TOLERANCE,
+                           max_iterations=MAX_ITERATIONS, monitor=None):
+    """
+    Compute personalized PageRank for many teleport distributions at once.
+
+    `teleports` is an (n, k) matrix whose columns are probability
+    distributions over pages. Column j of the result is the PageRank of
+    a surfer who, instead of jumping uniformly, jumps according to
+    column j; dangling pages also jump that way. All k columns are
+    updated together with one sparse matrix-matrix product per
+    iteration, until every column's L1 change is below `tolerance`.
+    `monitor(iteration, residual)` is called with the largest change.
+
+    Return the (n, k) rank matrix and the number of iterations taken.
+    """
+    convergence = Convergence(tolerance, max_iterations, monitor)
+    teleports = np.asarray(teleports, dtype=np.float64)
+    ranks = teleports.copy()
+    for iteration in convergence.iterations():
+        dangling = ranks[graph.dangling].sum(axis=0)
+        new_ranks = (damping_factor * graph.propagate(ranks)
+                     + (damping_factor * dangling + 1 - damping_factor)
+                     * teleports)
+        residual = np.abs(new_ranks - ranks).sum(axis=0).max()
+        ranks = new_ranks
+        if convergence.converged(iteration, residual):
+            break
+    return ranks, iteration
+
+
+def teleport_matrix(graph, distributions, names=None):
+    """
+    Returns an (n, k) teleport matrix from a list of k dictionaries
+    mapping page names to non-negative weights. Each column is
+    normalized to sum to 1; pages missing from a dictionary get 0.
+
+    Raises ValueError for a distribution with no weight or naming a
+    page not in `graph`, naming it by its entry in `names` if given,
+    or else by its position.
+    """
+    if names is None:
+        names = range(len(distributions))
+    index = {page: i for i, page in enumerate(graph.pages)}
+    teleports = np.zeros((len(graph), len(distributions)))
+    for j, (name, weights) in enumerate(zip(names, distributions)):
+        for page, weight in weights.items():
+            if page not in index:
+                raise ValueError(f"teleport distribution {name} names "
+                                 f"unknown page {page}")
+            teleports[index[page], j] = weight
+        total = teleports[:, j].sum()
+        if total <= 0:
+            raise ValueError(f"teleport distribution {name} has no weight")
+        teleports[:, j] /= total
+    return teleports
+
+
+def gauss_seidel(graph, damping_factor, convergence=None, start=None,
+                 blocks=GAUSS_SEIDEL_BLOCKS):
+    """
+    Compute PageRank over a LinkGraph by block Gauss-Seidel iteration.
+
+    A sweep updates the pages in `blocks` blocks of consecutive pages,
+    each block using the ranks already updated by the blocks before it
+    in the same sweep, including the rank held by dangling pages. With
+    a block per page this is plain Gauss-Seidel; with fewer, larger
+    blocks every block is one vectorized update. More blocks take fewer
+    sweeps, most of all as `damping_factor` approaches 1, but each
+    sweep costs more.
+
+    Return the rank vector and the number of sweeps taken.
+    """
+    convergence = convergence or Convergence()
+    n = len(graph)
+    ranks = np.full(n, 1 / n) if start is None else np.array(start, float)
+    share = shares(graph, ranks)
+    dangling = ranks[graph.dangling].sum()
+
+    bounds = np.linspace(0, n, min(n, blocks) + 1).astype(int)
+    blocks = [
+        (slice(a, b), incoming(graph, np.arange(a, b)))
+        for a, b in zip(bounds[:-1], bounds[1:])
+    ]
+
+    for iteration in convergence.iterations():
+        previous = ranks.copy()
+        for block, links in blocks:
+            new_ranks = (damping_factor * (receive(share, *links) + dangling / n)
+                         + (1 - damping_factor) / n)
+            dangling += (new_ranks - ranks[block])[graph.dangling[block]].sum()
+            ranks[block] = new_ranks
+            share[block] = shares(graph, ranks, block)
+
+        # Unlike a power step a sweep does not keep the total rank at 1;
+        # rescaling removes the error along the PageRank vector itself,
+        # which otherwise only decays by `damping_factor` per sweep
+        total = ranks.sum()
+        ranks /= total
+        share /= total
+        dangling /= total
+        if convergence.converged(iteration, np.abs(ranks - previous).sum(),
+                                 ranks):
+            break
+    return ranks, iteration
+
+
+def extrapolated(graph, damping_factor, convergence=None, start=None):
+    """
+    Compute PageRank by power iteration, accelerated every
+    EXTRAPOLATION_INTERVAL iterations by quadratic extrapolation: the
+    last four iterates are fitted with the two largest non-principal
+    eigenvectors of the transition matrix, which are then removed. An
+    extrapolation after which the next step changes the ranks more
+    than the step before it did is discarded, and iteration goes on
+    from the ranks it started from; that step still counts.
+
+    Return the rank vector and the number of iterations taken.
+    """
+    convergence = convergence or Convergence()
+    n = len(graph)
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, float)
+    history = [ranks]
+    fallback = None
+    for iteration in convergence.iterations():
+        new_ranks = step(graph, damping_factor, ranks)
+        residual = np.abs(new_ranks - ranks).sum()
+
+        # Undo an extrapolation that moved away from the limit; the step
+        # is still reported, and cannot converge as its residual is
+        # above one that did not
+        if fallback is not None and residual > fallback[1]:
+            ranks = fallback[0]
+            history = [ranks]
+            fallback = None
+            convergence.converged(iteration, residual)
+            continue
+        fallback = None
+
+        ranks = new_ranks
+        if convergence.converged(iteration, residual, ranks):
+            break
+        history = history[-3:] + [ranks]
+        if iteration % EXTRAPOLATION_INTERVAL == 0 and len(history) == 4:
+            fallback = (ranks, residual)
+            ranks = quadratic_step(*history)
+            history = [ranks]
+    return ranks, iteration
+
+
+def quadratic_step(x0, x1, x2, x3):
+    """
+    Quadratic extrapolation (Kamvar et al.) of four successive iterates.
+    """
+    y = np.stack([x1 - x0, x2 - x0], axis=1)
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    beta = [gamma[0] + gamma[1] + 1, gamma[1] + 1, 1]
+    return normalize(beta[0] * x1 + beta[1] * x2 + beta[2] * x3)
+
+
+def normalize(ranks):
+    """
+    Clip negative ranks left by an extrapolation and scale to sum to 1.
+    """
+    ranks = np.maximum(ranks, 0)
+    return ranks / ranks.sum()
+
+
+def adaptive(graph, damping_factor, convergence=None, start=None):
+    """
+    Compute PageRank by adaptive power iteration (Kamvar et al.).
+
+    Every ADAPTIVE_INTERVAL iterations a full power step updates all
+    pages. Pages whose rank changed by less than (1 - damping_factor)
+    * tolerance / n, their share of the tolerance scaled by the slowest
+    rate of convergence, in ADAPTIVE_CHECKS full steps in a row are
+    frozen, unless they are within ADAPTIVE_REACH links of a page that
+    is still moving: the iterations in between keep their ranks and
+    only update the remaining pages, with the links into them. The next
+    full step checks the frozen pages again and thaws any that moved.
+    Most pages converge long before the slowest ones, so most
+    iterations touch far fewer links.
+
+    Iteration only stops after a full step, on its residual, so the
+    result is as close to PageRank as power iteration's.
+
+    Return the rank vector and the number of iterations taken.
+    """
+    convergence = convergence or Convergence()
+    n = len(graph)
+    ranks = np.full(n, 1 / n) if start is None else np.array(start, float)
+    threshold = (1 - damping_factor) * convergence.tolerance / n
+    sources = np.repeat(np.arange(n, dtype=np.int64), graph.out_degree)
+    quiet = np.zeros(n, dtype=np.int64)
+    active = np.arange(n)
+    links = incoming(graph, active)
+    check = False
+    for iteration in convergence.iterations():
+        full = check or iteration % ADAPTIVE_INTERVAL == 0
+        if full:
+            new_ranks = step(graph, damping_factor, ranks)
+            change = np.abs(new_ranks - ranks)
+            ranks = new_ranks
+        else:
+            dangling = ranks[graph.dangling].sum()
+            new_ranks = (damping_factor
+                         * (receive(shares(graph, ranks), *links)
+                            + dangling / n)
+                         + (1 - damping_factor) / n)
+            change = np.abs(new_ranks - ranks[active])
+            ranks[active] = new_ranks
+
+        # Only a full step may end the iteration; a partial one that
+        # would have is followed by a full step right away
+        check = convergence.converged(iteration, change.sum(),
+                                      ranks if full else None)
+        if check and full:
+            break
+        if full:
+            quiet = np.where(change < threshold, quiet + 1, 0)
+            moving = quiet < ADAPTIVE_CHECKS
+            for _ in range(ADAPTIVE_REACH):
+                moving[graph.targets[moving[sources]]] = True
+            moving = np.flatnonzero(moving)
+            if not np.array_equal(moving, active):
+                active = moving
+                links = incoming(graph, active)
+    return ranks / ranks.sum(), iteration
+
+
+def shares(graph, ranks, pages=slice(None)):
+    """
+    Returns the rank each of `pages` sends along every one of its links,
+    0 for dangling pages.
+    """
+    degree = graph.out_degree[pages]
+    return np.divide(ranks[pages], degree, out=np.zeros(len(degree)),
+                     where=degree > 0)
+
+
+def incoming(graph, pages):
+    """
+    Returns the links into `pages`, an array of page numbers, as the
+    arrays `receive` expects: their sources, the offset of each page's
+    first link, and which pages have any links at all.
+    """
+    counts = graph.in_degree[pages]
+    offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    positions = (np.repeat(graph.in_offsets[pages] - offsets[:-1], counts)
+                 + np.arange(offsets[-1]))
+    return graph.in_sources[positions], offsets[:-1], counts > 0
+
+
+def receive(share, sources, starts, receiving):
+    """
+    Returns the rank arriving through the links found by `incoming`,
+    given every page's `share`.
+    """
+    received = np.zeros(len(starts))
+    if len(sources):
+        received[receiving] = np.add.reduceat(share[sources],
+                                              starts[receiving])
+    return received
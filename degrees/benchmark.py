@@ -0,0 +1,179 @@
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from util import (Node, StackFrontier, QueueFrontier,
+                  DequeStackFrontier, DequeQueueFrontier)
+
+# Frontier implementations compared by the frontier benchmark
+FRONTIERS = {
+    "StackFrontier": StackFrontier,
+    "QueueFrontier": QueueFrontier,
+    "DequeStackFrontier": DequeStackFrontier,
+    "DequeQueueFrontier": DequeQueueFrontier,
+}
+
+# Number of contains_state probes timed per run
+PROBES = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Microbenchmarks for the degrees project.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    frontier = commands.add_parser(
+        "frontier", help="compare frontier implementations")
+    frontier.add_argument("--sizes", default="1000,10000,100000,1000000",
+                          help="comma-separated frontier sizes")
+    frontier.add_argument("--max-list", type=int, default=100000,
+                          help="largest size to run list-based frontiers at")
+
+    loader = commands.add_parser(
+        "loader", help="compare the dict and streaming compact loaders")
+    loader.add_argument("--rows", type=int, default=10000000,
+                        help="rows of the synthetic stars.csv")
+    loader.add_argument("--directory",
+                        help="existing dataset to load instead of "
+                             "generating a synthetic one")
+
+    args = parser.parse_args()
+    if args.command == "frontier":
+        sizes = [int(size) for size in args.sizes.split(",")]
+        benchmark_frontiers(sizes, args.max_list)
+    elif args.command == "loader":
+        if args.directory:
+            benchmark_loaders(args.directory)
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                print(f"Generating {args.rows} star rows...")
+                generate_dataset(directory, args.rows)
+                benchmark_loaders(directory)
+
+
+def benchmark_frontiers(sizes, max_list):
+    """
+    Fill each frontier with n nodes, probe it with contains_state and
+    drain it, printing the time per operation for each phase.
+    """
+    print(f"{'frontier':<20}{'n':>10}{'add':>12}{'contains':>12}{'remove':>12}")
+    for n in sizes:
+        for name, frontier_class in FRONTIERS.items():
+            if not name.startswith("Deque") and n > max_list:
+                continue
+            add, contains, remove = time_frontier(frontier_class, n)
+            print(f"{name:<20}{n:>10}{format_time(add):>12}"
+                  f"{format_time(contains):>12}{format_time(remove):>12}")
+
+
+def time_frontier(frontier_class, n):
+    """
+    Returns the average seconds per add, contains_state and remove
+    on a frontier holding `n` nodes.
+    """
+    nodes = [Node(state=i, parent=None, action=None) for i in range(n)]
+    probes = [random.randrange(2 * n) for _ in range(PROBES)]
+    frontier = frontier_class()
+
+    start = time.perf_counter()
+    for node in nodes:
+        frontier.add(node)
+    add = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for state in probes:
+        frontier.contains_state(state)
+    contains = (time.perf_counter() - start) / len(probes)
+
+    start = time.perf_counter()
+    while not frontier.empty():
+        frontier.remove()
+    remove = (time.perf_counter() - start) / n
+
+    return add, contains, remove
+
+
+def generate_dataset(directory, rows, seed=0):
+    """
+    Write a synthetic people.csv, movies.csv and stars.csv with `rows`
+    star rows to `directory`, in roughly IMDb proportions.
+    """
+    rng = random.Random(seed)
+    n_people = max(1, rows // 3)
+    n_movies = max(1, rows // 10)
+    with open(os.path.join(directory, "people.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 120])
+    with open(os.path.join(directory, "movies.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            writer.writerow([i, f"Movie {i}", 1900 + i % 120])
+    with open(os.path.join(directory, "stars.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for _ in range(rows):
+            writer.writerow([rng.randrange(n_people), rng.randrange(n_movies)])
+
+
+# Loads a dataset with one backend and prints its time and peak memory
+LOADER_SCRIPT = """
+import json, sys, time
+import degrees
+from graph import CompactGraph
+from loader import peak_memory
+start = time.perf_counter()
+if sys.argv[2] == "compact":
+    degrees.load_graph(CompactGraph.from_csv(sys.argv[1]))
+else:
+    degrees.load_data(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "peak": peak_memory()}))
+"""
+
+
+def benchmark_loaders(directory):
+    """
+    Load `directory` with the dict and the streaming compact backend,
+    each in a fresh process so that peak memory is measured separately.
+    Both always parse the CSV files, even if a snapshot cache exists.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'backend':<10}{'time':>12}{'peak RSS':>14}")
+    for backend in ["dict", "compact"]:
+        env = dict(os.environ, PYTHONPATH=here)
+        result = subprocess.run(
+            [sys.executable, "-c", LOADER_SCRIPT, directory, backend],
+            capture_output=True, text=True, check=True, env=env, cwd=here
+        )
+        stats = json.loads(result.stdout.splitlines()[-1])
+        if stats["peak"] is None:
+            peak = "n/a"
+        else:
+            peak = f"{stats['peak'] / 2 ** 20:.0f} MB"
+        print(f"{backend:<10}{format_time(stats['seconds']):>12}{peak:>14}")
+
+
+def format_time(seconds):
+    """
+    Format a duration in the most readable unit.
+    """
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    if seconds >= 1e-6:
+        return f"{seconds * 1e6:.2f} us"
+    return f"{seconds * 1e9:.0f} ns"
+
+
+if __name__ == "__main__":
+    main()
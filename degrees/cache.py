@@ -0,0 +1,196 @@
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Sequence
+
+from graph import CompactGraph
+from namesearch import NameIndex
+
+MAGIC = b"DEGCACHE"
+VERSION = 2
+
+# Source files whose size and mtime are recorded in the snapshot
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Integer arrays of a CompactGraph and their array typecodes
+ARRAYS = {
+    "person_offsets": "q",
+    "person_movies": "i",
+    "movie_offsets": "q",
+    "movie_stars": "i",
+    "person_order": "i",
+    "movie_order": "i",
+    "name_order": "i",
+}
+
+# String columns of a CompactGraph
+STRINGS = [
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+]
+
+# Integer arrays and string columns of the NameIndex over the people
+INDEX_ARRAYS = {
+    "order": "i",
+    "gram_offsets": "q",
+    "gram_people": "i",
+}
+INDEX_STRINGS = ["keys", "grams"]
+
+
+def cache_path(directory):
+    """
+    Returns the default location of the snapshot for `directory`.
+    """
+    return os.path.join(directory, "degrees.cache")
+
+
+def source_stats(directory):
+    """
+    Returns the (size, mtime) of each source CSV file in `directory`.
+    """
+    stats = {}
+    for filename in SOURCES:
+        st = os.stat(os.path.join(directory, filename))
+        stats[filename] = [st.st_size, st.st_mtime_ns]
+    return stats
+
+
+def save(graph, directory, path=None):
+    """
+    Write `graph`, built from the CSV files in `directory`, to a
+    versioned binary snapshot.
+
+    The file is a fixed preamble (magic, version, header length), a JSON
+    header, then one 8-byte aligned section per array. String columns
+    are stored as a UTF-8 blob plus an offsets array. The NameIndex
+    over the people is built and stored too, its sections prefixed
+    with "index.", so that fuzzy lookups never have to build it.
+    """
+    path = path or cache_path(directory)
+    index = NameIndex.build(graph.person_ids, graph.person_names,
+                            graph.person_births)
+    sections = []
+    for prefix, source, arrays, strings in [
+            ("", graph, ARRAYS, STRINGS),
+            ("index.", index, INDEX_ARRAYS, INDEX_STRINGS)]:
+        for name, typecode in arrays.items():
+            sections.append((prefix + name, typecode,
+                             array(typecode, getattr(source, name))))
+        for name in strings:
+            blob, offsets = encode_strings(getattr(source, name))
+            sections.append((f"{prefix}{name}.blob", "B", blob))
+            sections.append((f"{prefix}{name}.offsets", "q", offsets))
+
+    layout = {}
+    offset = 0
+    for name, typecode, data in sections:
+        layout[name] = [typecode, offset, len(data)]
+        offset = align(offset + len(data) * data.itemsize)
+    header = json.dumps({"sources": source_stats(directory),
+                         "sections": layout}).encode("utf-8")
+    start = align(len(MAGIC) + 8 + len(header))
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<II", VERSION, len(header)) + header)
+        for name, typecode, data in sections:
+            f.seek(start + layout[name][1])
+            data.tofile(f)
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+def load(directory, path=None):
+    """
+    Memory-map the snapshot for `directory` and return a CompactGraph
+    backed by it, with the stored NameIndex as its `name_index`.
+
+    Returns None if there is no snapshot, it was written by another
+    version, or the source CSV files changed since it was built.
+    """
+    path = path or cache_path(directory)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        preamble = f.read(len(MAGIC) + 8)
+        if len(preamble) < len(MAGIC) + 8 or not preamble.startswith(MAGIC):
+            return None
+        version, length = struct.unpack("<II", preamble[len(MAGIC):])
+        if version != VERSION:
+            return None
+        header = json.loads(f.read(length).decode("utf-8"))
+        try:
+            if header["sources"] != source_stats(directory):
+                return None
+        except FileNotFoundError:
+            return None
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    start = align(len(MAGIC) + 8 + length)
+
+    def section(name):
+        typecode, offset, count = header["sections"][name]
+        offset += start
+        size = count * array(typecode).itemsize
+        return data[offset:offset + size].cast(typecode)
+
+    def strings(name):
+        return StringTable(section(f"{name}.blob"), section(f"{name}.offsets"))
+
+    fields = {name: section(name) for name in ARRAYS}
+    for name in STRINGS:
+        fields[name] = strings(name)
+    graph = CompactGraph(**fields)
+
+    index = {name: section(f"index.{name}") for name in INDEX_ARRAYS}
+    for name in INDEX_STRINGS:
+        index[name] = strings(f"index.{name}")
+    graph.name_index = NameIndex(graph.person_ids, graph.person_names,
+                                 graph.person_births, **index)
+    return graph
+
+
+class StringTable(Sequence):
+    """
+    Sequence of strings decoded lazily from a UTF-8 blob, where string
+    `i` is `blob[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def encode_strings(strings):
+    """
+    Returns (blob, offsets) arrays encoding `strings` for a StringTable.
+    """
+    blob = array("B")
+    offsets = array("q", [0])
+    for s in strings:
+        blob.frombytes(s.encode("utf-8"))
+        offsets.append(len(blob))
+    return blob, offsets
+
+
+def align(offset):
+    """
+    Round `offset` up to a multiple of 8 bytes.
+    """
+    return (offset + 7) & ~7
+
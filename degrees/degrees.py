@@ -1,7 +1,19 @@
+import argparse
 import csv
+import heapq
+import itertools
+import json
+import os
 import sys
+import time
 
-from util import Node, StackFrontier, QueueFrontier
+import cache
+from graph import CompactGraph
+from landmarks import LandmarkOracle
+from loader import peak_memory
+from namesearch import NameIndex
+from util import (Node, StackFrontier, QueueFrontier, DequeQueueFrontier,
+                  BFSTree, TreeCache)
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +24,41 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Integer-indexed graph backing the globals above, when loaded with
+# the "compact" backend
+graph = None
 
-def load_data(directory):
+# LRU cache of search trees used by the "cached" algorithm
+path_cache = None
+
+# Fuzzy index over all names, built on first use
+name_index = None
+
+# Landmark distances used by the "astar" algorithm and --estimate
+landmark_oracle = None
+
+# Lowest fuzzy match score offered as a candidate for a name
+MIN_SCORE = 0.4
+
+
+def load_data(directory, backend="dict", progress=None):
     """
     Load data from CSV files into memory.
+
+    With `backend="compact"`, the data is held in a CompactGraph and
+    `names`, `people` and `movies` become read-only views onto it. The
+    graph is memory-mapped from the binary snapshot written by
+    `build_cache` when one is present and up to date. Otherwise the CSV
+    files are streamed, calling `progress(path, bytes_read, total_bytes)`
+    as they are read.
     """
+    if backend == "compact":
+        compact_graph = cache.load(directory)
+        if compact_graph is None:
+            compact_graph = CompactGraph.from_csv(directory, progress)
+        load_graph(compact_graph)
+        return
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,24 +94,201 @@ def load_data(directory):
                 pass
 
 
+def load_graph(compact_graph):
+    """
+    Use `compact_graph` as the backend for all lookups.
+    """
+    global graph, names, people, movies, name_index
+    graph = compact_graph
+    name_index = None
+    names = graph.names
+    people = graph.people
+    movies = graph.movies
+
+
+def build_cache(directory, progress=None):
+    """
+    Parse the CSV files in `directory` and write a binary snapshot
+    that later runs can memory-map instead.
+    """
+    cache.save(CompactGraph.from_csv(directory, progress), directory)
+
+
+def build_landmarks(directory, path, count=16, landmarks=None):
+    """
+    Run a breadth-first search from each landmark person_id, or from
+    the `count` people with the most movies, and save the distances
+    to `path`, recording the CSV files in `directory` they come from.
+    """
+    if not landmarks:
+        landmarks = sorted(
+            people,
+            key=lambda person_id: len(people[person_id]["movies"]),
+            reverse=True
+        )[:count]
+    oracle = LandmarkOracle.build(landmarks, list(people),
+                                  neighbors_for_person,
+                                  cache.source_stats(directory))
+    oracle.save(path)
+    return oracle
+
+
+def load_landmarks(directory, path):
+    """
+    Load landmark distances saved by `build_landmarks` for the
+    current data, loaded from `directory`. Raises ValueError if they
+    were built from other data.
+    """
+    global landmark_oracle
+    if graph is not None:
+        index = graph.person_index
+    else:
+        index = {person_id: i for i, person_id in enumerate(people)}.get
+    landmark_oracle = LandmarkOracle.load(path, index, len(people),
+                                          cache.source_stats(directory))
+    return landmark_oracle
+
+
+def report_progress(path, bytes_read, total_bytes):
+    """
+    Show how far through a CSV file loading is on standard error.
+    """
+    percent = 100 * bytes_read / total_bytes if total_bytes else 100
+    end = "\n" if bytes_read >= total_bytes else ""
+    print(f"\r  {os.path.basename(path)}: {percent:.0f}%",
+          end=end, file=sys.stderr, flush=True)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--backend", choices=["dict", "compact"],
+                        help="in-memory representation of the graph "
+                             "(default: compact if a cache exists, else dict)")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS),
+                        default="bfs",
+                        help="search used to find the shortest path")
+    parser.add_argument("--frontier", choices=sorted(FRONTIERS),
+                        default="list",
+                        help="frontier implementation used by bfs")
+    parser.add_argument("--source",
+                        help="name of the source person for batch queries")
+    parser.add_argument("--targets",
+                        help="file of target names, one per line; answers "
+                             "all of them from a single search")
+    parser.add_argument("--disambiguate", choices=["prompt", "best", "none"],
+                        default="prompt",
+                        help="how to choose between several people matching "
+                             "a name; batch targets are never prompted for")
+    parser.add_argument("--output",
+                        help="file to write batch results to as JSON lines "
+                             "(default: standard output)")
+    parser.add_argument("--build-cache", action="store_true",
+                        help="write a binary snapshot of the data and exit")
+    parser.add_argument("--build-landmarks", metavar="FILE",
+                        help="precompute landmark distances into FILE "
+                             "and exit")
+    parser.add_argument("--landmark", action="append", default=[],
+                        help="name of a landmark person for "
+                             "--build-landmarks; may be repeated")
+    parser.add_argument("--landmark-count", type=int, default=16,
+                        help="number of landmarks picked automatically "
+                             "when none are named")
+    parser.add_argument("--landmarks", metavar="FILE",
+                        help="landmark distances for --estimate and the "
+                             "astar algorithm")
+    parser.add_argument("--estimate", action="store_true",
+                        help="only print bounds on the degrees of "
+                             "separation, using --landmarks")
+    return parser.parse_args(argv)
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = parse_args(sys.argv[1:])
+
+    if args.build_cache:
+        print("Building cache...")
+        build_cache(args.directory, report_progress)
+        print(f"Cache written to {cache.cache_path(args.directory)}.")
+        return
+    if args.backend is None:
+        if os.path.exists(cache.cache_path(args.directory)):
+            args.backend = "compact"
+        else:
+            args.backend = "dict"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    start = time.perf_counter()
+    load_data(args.directory, args.backend, report_progress)
+    elapsed = time.perf_counter() - start
+    peak = peak_memory()
+    if peak is None:
+        print(f"Data loaded in {elapsed:.2f} s.")
+    else:
+        print(f"Data loaded in {elapsed:.2f} s "
+              f"(peak memory {peak / 2 ** 20:.0f} MB).")
+
+    if args.build_landmarks:
+        landmarks = []
+        for name in args.landmark:
+            person_id = person_id_for_name(name, args.disambiguate)
+            if person_id is None:
+                sys.exit(f"Person not found: {name}")
+            landmarks.append(person_id)
+        print("Computing landmark distances...")
+        oracle = build_landmarks(args.directory, args.build_landmarks,
+                                 args.landmark_count, landmarks)
+        print(f"Distances from {len(oracle.landmarks)} landmarks written "
+              f"to {args.build_landmarks}.")
+        return
+    if args.landmarks:
+        try:
+            load_landmarks(args.directory, args.landmarks)
+        except ValueError as e:
+            sys.exit(f"{e}; rebuild it with --build-landmarks.")
+    elif args.estimate or args.algorithm == "astar":
+        sys.exit("--landmarks is required for --estimate and astar.")
+
+    if args.targets:
+        source = person_id_for_name(args.source or input("Name: "),
+                                    args.disambiguate)
+        if source is None:
+            sys.exit("Person not found.")
+        if args.disambiguate == "prompt":
+            args.disambiguate = "none"
+        with open(args.targets, encoding="utf-8") as targets:
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as output:
+                    run_batch(source, targets, output, args.disambiguate)
+            else:
+                run_batch(source, targets, sys.stdout, args.disambiguate)
+        return
 
-    source = person_id_for_name(input("Name: "))
+    source = person_id_for_name(input("Name: "), args.disambiguate)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), args.disambiguate)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if args.estimate:
+        lower, upper = landmark_oracle.bounds(source, target)
+        if lower is None:
+            print("Not connected.")
+        elif upper is None:
+            print(f"At least {lower} degrees of separation.")
+        elif lower == upper:
+            print(f"{lower} degrees of separation.")
+        else:
+            print(f"Between {lower} and {upper} degrees of separation.")
+        return
+
+    if args.algorithm == "bfs":
+        path = shortest_path(source, target, FRONTIERS[args.frontier])
+    else:
+        path = ALGORITHMS[args.algorithm](source, target)
 
     if path is None:
         print("Not connected.")
@@ -84,17 +303,20 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, frontier=QueueFrontier):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
+    `frontier` is the queue class used for the search, e.g.
+    QueueFrontier or DequeQueueFrontier.
+
     If no possible path, returns None.
     """
 
     # Starting position
     start = Node(state=source, parent=None, action=None)
-    actors = QueueFrontier()
+    actors = frontier()
     actors.add(start)
 
     # set of explored movies
@@ -105,7 +327,7 @@ def shortest_path(source, target):
 
         # If no actors left, then there is no solution
         if actors.empty():
-            raise Exception("no solution")
+            return None
 
         # Pick node to investigate
         node = actors.remove()
@@ -114,11 +336,10 @@ def shortest_path(source, target):
         neighbors = neighbors_for_person(node.state)
         possibilities = [item[1] for item in neighbors]
         if target in possibilities:
-            for action, state in neighbors_for_person(node.state):
+            for action, state in neighbors:
                 if state == target:
-                    child = Node(state=state, parent=node, action=action)
-                    actors.add(child)
-            node = actors.remove()
+                    node = Node(state=state, parent=node, action=action)
+                    break
             movies = []
             actors = []
             while node.parent is not None:
@@ -144,30 +365,281 @@ def shortest_path(source, target):
                 actors.add(child)
 
 
-def person_id_for_name(name):
+def shortest_paths_from(source, targets):
+    """
+    Yields a (target, path) pair for each person_id in `targets`, where
+    path is the shortest list of (movie_id, person_id) pairs from the
+    source to the target, or None if they are not connected or the
+    target is None.
+
+    All paths come from a single breadth-first search tree rooted at
+    the source, which only grows as far as the targets require.
+    `targets` is read lazily, one target per path yielded.
+    """
+    tree = BFSTree(source, neighbors_for_person)
+    for target in targets:
+        yield target, None if target is None else tree.path_to(target)
+
+
+def run_batch(source, lines, output, disambiguate="none"):
+    """
+    Find the path from `source` to every person named in `lines`,
+    writing one JSON object per target to `output` as soon as it is
+    found. Names are resolved with person_id_for_name, using the
+    non-interactive `disambiguate` policy, and all paths come from
+    `shortest_paths_from`.
+    """
+    names = (line.strip() for line in lines)
+    names, queries = itertools.tee(name for name in names if name)
+    targets = (person_id_for_name(name, disambiguate) for name in queries)
+
+    for name, (target, path) in zip(names,
+                                    shortest_paths_from(source, targets)):
+        result = {
+            "source": people[source]["name"],
+            "source_id": source,
+            "target": name,
+        }
+        if target is None:
+            result["error"] = "not found or ambiguous"
+        else:
+            result["target_id"] = target
+            result["degrees"] = None if path is None else len(path)
+            result["path"] = path
+        output.write(json.dumps(result) + "\n")
+
+
+def cached_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, reusing the search trees
+    of earlier queries from or to the same people.
+
+    If no possible path, returns None.
+    """
+    global path_cache
+    if path_cache is None:
+        path_cache = TreeCache(neighbors_for_person,
+                               entry_bytes=tree_entry_bytes())
+    return path_cache.path(source, target)
+
+
+def shortest_path_astar(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using A* search with the
+    landmark lower bounds as the heuristic.
+
+    If no possible path, returns None.
+    """
+    heuristic = landmark_oracle.lower_bound
+    estimate = heuristic(source, target)
+    if estimate is None:
+        return None
+
+    # Maps each reached person to (degrees from source, (movie_id, parent))
+    reached = {source: (0, None)}
+    queue = [(estimate, 0, source)]
+    while queue:
+        _, cost, person_id = heapq.heappop(queue)
+        if person_id == target:
+            path = []
+            while reached[person_id][1] is not None:
+                movie_id, parent = reached[person_id][1]
+                path.append((movie_id, person_id))
+                person_id = parent
+            path.reverse()
+            return path
+        if cost > reached[person_id][0]:
+            continue
+        for movie_id, neighbor in neighbors_for_person(person_id):
+            if neighbor in reached and reached[neighbor][0] <= cost + 1:
+                continue
+            estimate = heuristic(neighbor, target)
+            if estimate is None:
+                continue
+            reached[neighbor] = (cost + 1, (movie_id, person_id))
+            heapq.heappush(queue, (cost + 1 + estimate, cost + 1, neighbor))
+    return None
+
+
+def shortest_path_bidirectional(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both people at once.
+
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step
+    # leading back towards the side's starting person
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    # Always grow the smaller frontier by one whole level
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meetings = expand_level(
+                forward_frontier, forward, backward)
+        else:
+            backward_frontier, meetings = expand_level(
+                backward_frontier, backward, forward)
+
+        # Every meeting found within a level is a candidate, keep the shortest
+        if meetings:
+            return min(
+                (splice(person, forward, backward) for person in meetings),
+                key=len
+            )
+
+    return None
+
+
+def expand_level(frontier, parents, others):
+    """
+    Expand every person in `frontier` by one step, recording new people
+    in `parents`. Returns the next frontier and the set of people that
+    were also reached from the other side, as recorded in `others`.
+    """
+    next_frontier = []
+    meetings = set()
+    for person_id in frontier:
+        for movie_id, neighbor in neighbors_for_person(person_id):
+            if neighbor not in parents:
+                parents[neighbor] = (movie_id, person_id)
+                next_frontier.append(neighbor)
+            if neighbor in others:
+                meetings.add(neighbor)
+    return next_frontier, meetings
+
+
+def splice(person_id, forward, backward):
+    """
+    Join the forward chain from the source to `person_id` with the
+    backward chain from `person_id` to the target.
+    """
+    path = []
+    person = person_id
+    while forward[person] is not None:
+        movie_id, parent = forward[person]
+        path.append((movie_id, person))
+        person = parent
+    path.reverse()
+
+    person = person_id
+    while backward[person] is not None:
+        movie_id, child = backward[person]
+        path.append((movie_id, child))
+        person = child
+    return path
+
+
+def person_id_for_name(name, disambiguate="prompt"):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If nobody has exactly that name, the closest names from the fuzzy
+    index are the candidates instead. `disambiguate` chooses between
+    several candidates: "prompt" asks on standard input, "best" takes
+    the highest ranked one and "none" gives up unless the name is an
+    exact, unique match.
     """
     person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
-        return None
-    elif len(person_ids) > 1:
-        print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
+    if len(person_ids) == 1:
+        return person_ids[0]
+    if disambiguate == "none":
         return None
+
+    if len(person_ids) == 0:
+        candidates = [
+            (person_id, person_name, birth)
+            for person_id, person_name, birth, score in find_people(name)
+            if score >= MIN_SCORE
+        ]
+        heading = f"No exact match for '{name}'. Did you mean:"
     else:
-        return person_ids[0]
+        # Namesakes with the most movies first
+        person_ids.sort(key=lambda person_id: len(people[person_id]["movies"]),
+                        reverse=True)
+        candidates = [
+            (person_id, people[person_id]["name"], people[person_id]["birth"])
+            for person_id in person_ids
+        ]
+        heading = f"Which '{name}'?"
+    if len(candidates) == 0:
+        return None
+    if disambiguate == "best":
+        return candidates[0][0]
+
+    print(heading)
+    for person_id, name, birth in candidates:
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in [candidate[0] for candidate in candidates]:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def find_people(query, k=5):
+    """
+    Returns up to `k` (person_id, name, birth, score) tuples for the
+    names closest to `query`, best first.
+    """
+    return build_name_index().search(query, k)
+
+
+def build_name_index():
+    """
+    Returns the fuzzy name index: the one stored in the snapshot the
+    graph was loaded from, or one built on first use.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None and graph.name_index is not None:
+            name_index = graph.name_index
+        elif graph is not None:
+            name_index = NameIndex.build(graph.person_ids, graph.person_names,
+                                         graph.person_births)
+        else:
+            person_ids = list(people)
+            name_index = NameIndex.build(
+                person_ids,
+                [people[person_id]["name"] for person_id in person_ids],
+                [people[person_id]["birth"] for person_id in person_ids]
+            )
+    return name_index
+
+
+def tree_entry_bytes():
+    """
+    Returns the estimated memory of one entry of a search tree over the
+    current data, for TreeCache.
+
+    The dict backend and a CompactGraph built from CSV return ids held
+    by the loaded data, so an entry only adds its (movie_id, parent)
+    tuple. A graph memory-mapped from the snapshot decodes new id
+    strings on every lookup, and each entry keeps two of them: the
+    person reached and the movie leading to them.
+    """
+    entry = TreeCache.ENTRY_BYTES
+    if graph is None or not len(graph.person_ids) or not len(graph.movie_ids):
+        return entry
+    if graph.person_ids[0] is graph.person_ids[0]:
+        return entry
+    sample = range(min(len(graph.person_ids), len(graph.movie_ids), 1000))
+    return entry + sum(
+        sys.getsizeof(graph.person_ids[i]) + sys.getsizeof(graph.movie_ids[i])
+        for i in sample
+    ) // len(sample)
 
 
 def neighbors_for_person(person_id):
@@ -175,6 +647,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -183,5 +657,21 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+# Search algorithms selectable with --algorithm
+ALGORITHMS = {
+    "bfs": shortest_path,
+    "bidirectional": shortest_path_bidirectional,
+    "cached": cached_shortest_path,
+    "astar": shortest_path_astar,
+}
+
+
+# Queue implementations selectable with --frontier
+FRONTIERS = {
+    "list": QueueFrontier,
+    "deque": DequeQueueFrontier,
+}
+
+
 if __name__ == "__main__":
     main()
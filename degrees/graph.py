@@ -0,0 +1,291 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from loader import read_columns
+
+
+class CompactGraph():
+    """
+    Bipartite person-movie graph with ids interned to dense integers.
+
+    People and movies are numbered 0..n-1 in the order they appear in
+    the CSV files. Adjacency is stored in CSR form: the movies of person
+    `i` are `person_movies[person_offsets[i]:person_offsets[i + 1]]`,
+    and the stars of movie `j` are
+    `movie_stars[movie_offsets[j]:movie_offsets[j + 1]]`.
+
+    String ids and names are resolved through sorted permutation arrays
+    instead of dictionaries, so the whole graph lives in a handful of
+    flat sequences.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_order=None, movie_order=None, name_order=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # Permutations of person / movie indexes sorted by id and by name
+        if person_order is None:
+            person_order = sorted_order(person_ids)
+        if movie_order is None:
+            movie_order = sorted_order(movie_ids)
+        if name_order is None:
+            name_order = sorted_order(person_names, key=str.lower)
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+
+        # Dictionary-like views matching the `people`, `movies` and `names`
+        # globals of degrees.py
+        self.people = PeopleView(self)
+        self.movies = MoviesView(self)
+        self.names = NamesView(self)
+
+        # Fuzzy NameIndex over the people, when one was loaded with the
+        # graph rather than built on first use
+        self.name_index = None
+
+    @classmethod
+    def from_csv(cls, directory, progress=None):
+        """
+        Build a compact graph from `people.csv`, `movies.csv` and
+        `stars.csv` in `directory`, streaming each file through
+        `loader.read_columns` with the optional `progress` callback.
+
+        Repeated (person, movie) rows are kept as repeated edges;
+        lookups return sets, so they only cost space.
+        """
+        person_ids, person_names, person_births = [], [], []
+        person_index = {}
+        for person_id, name, birth in read_columns(
+                f"{directory}/people.csv", ["id", "name", "birth"], progress):
+            person_index[person_id] = len(person_ids)
+            person_ids.append(person_id)
+            person_names.append(name)
+            person_births.append(birth)
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        movie_index = {}
+        for movie_id, title, year in read_columns(
+                f"{directory}/movies.csv", ["id", "title", "year"], progress):
+            movie_index[movie_id] = len(movie_ids)
+            movie_ids.append(movie_id)
+            movie_titles.append(title)
+            movie_years.append(year)
+
+        # Edge list of (person, movie) index pairs as two column arrays
+        stars_person = array("i")
+        stars_movie = array("i")
+        for person_id, movie_id in read_columns(
+                f"{directory}/stars.csv", ["person_id", "movie_id"], progress):
+            person = person_index.get(person_id)
+            movie = movie_index.get(movie_id)
+            if person is not None and movie is not None:
+                stars_person.append(person)
+                stars_movie.append(movie)
+        del person_index, movie_index
+
+        person_offsets, person_movies = build_csr(
+            len(person_ids), stars_person, stars_movie)
+        movie_offsets, movie_stars = build_csr(
+            len(movie_ids), stars_movie, stars_person)
+
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_stars)
+
+    def person_index(self, person_id):
+        """
+        Returns the integer index of `person_id`, or None if unknown.
+        """
+        return lookup(self.person_order, self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the integer index of `movie_id`, or None if unknown.
+        """
+        return lookup(self.movie_order, self.movie_ids, movie_id)
+
+    def movies_of(self, person):
+        """
+        Returns the movie indexes that person index `person` starred in.
+        """
+        offsets = self.person_offsets
+        return self.person_movies[offsets[person]:offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indexes starring in movie index `movie`.
+        """
+        offsets = self.movie_offsets
+        return self.movie_stars[offsets[movie]:offsets[movie + 1]]
+
+    def neighbor_indexes(self, person):
+        """
+        Returns (movie, person) index pairs for people who starred
+        with person index `person`.
+        """
+        neighbors = set()
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                neighbors.add((movie, star))
+        return neighbors
+
+    def neighbors(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people who starred
+        with `person_id`, in the same format as degrees.neighbors_for_person.
+        """
+        person = self.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        movie_ids = self.movie_ids
+        person_ids = self.person_ids
+        return {
+            (movie_ids[movie], person_ids[star])
+            for movie, star in self.neighbor_indexes(person)
+        }
+
+    def people_named(self, name):
+        """
+        Returns the person indexes whose name matches `name`, ignoring case.
+        """
+        names = self.person_names
+        key = name.lower()
+        order = self.name_order
+        i = bisect_left(order, key, key=lambda person: names[person].lower())
+        matches = []
+        while i < len(order) and names[order[i]].lower() == key:
+            matches.append(order[i])
+            i += 1
+        return matches
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `people` mapping: person_id -> {name, birth, movies}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `movies` mapping: movie_id -> {title, year, stars}.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only `names` mapping: lowercase name -> set of person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        graph = self.graph
+        matches = graph.people_named(name)
+        if not matches:
+            raise KeyError(name)
+        return {graph.person_ids[person] for person in matches}
+
+    def __iter__(self):
+        seen = set()
+        for name in self.graph.person_names:
+            if name.lower() not in seen:
+                seen.add(name.lower())
+                yield name.lower()
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def sorted_order(values, key=None):
+    """
+    Returns an array of indexes into `values`, sorted by value.
+    """
+    if key is None:
+        return array("i", sorted(range(len(values)), key=values.__getitem__))
+    return array("i", sorted(range(len(values)),
+                             key=lambda i: key(values[i])))
+
+
+def lookup(order, values, value):
+    """
+    Binary search `order` (a sorted permutation of `values`) for `value`.
+    Returns the matching index, or None if `value` is not present.
+    """
+    i = bisect_left(order, value, key=values.__getitem__)
+    if i < len(order) and values[order[i]] == value:
+        return order[i]
+    return None
+
+
+def build_csr(n, rows, columns):
+    """
+    Build CSR arrays (offsets, indices) for `n` rows out of parallel
+    `rows` and `columns` edge arrays.
+    """
+    offsets = array("q", bytes(8 * (n + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+
+    # Counting sort of columns into their row slots
+    indices = array("i", bytes(4 * len(columns)))
+    cursor = array("q", offsets[:-1])
+    for row, column in zip(rows, columns):
+        indices[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, indices
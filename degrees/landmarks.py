@@ -0,0 +1,132 @@
+import json
+import struct
+from array import array
+
+MAGIC = b"DEGLMARK"
+VERSION = 2
+
+# Distance stored for people a landmark cannot reach
+UNREACHABLE = 255
+
+
+class LandmarkOracle():
+    """
+    Distances from a few landmark people to everyone else, giving
+    bounds on the degrees of separation between any two people.
+
+    People are numbered by their row in people.csv, the order shared by
+    both degrees backends. `distances[i][p]` is the number of degrees
+    between landmark `i` and person `p`, or UNREACHABLE.
+    """
+
+    def __init__(self, landmarks, distances, index, sources=None):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.index = index
+        self.sources = sources
+
+    @classmethod
+    def build(cls, landmarks, person_ids, neighbors, sources=None):
+        """
+        Run a breadth-first search from every landmark over the people
+        in `person_ids`, where `neighbors(person_id)` returns
+        (movie_id, person_id) pairs. `sources` identifies the data they
+        come from, as returned by `cache.source_stats`.
+        """
+        index = {person_id: i for i, person_id in enumerate(person_ids)}
+        distances = [
+            distances_from(landmark, neighbors, index) for landmark in landmarks
+        ]
+        return cls(list(landmarks), distances, index.get, sources)
+
+    @classmethod
+    def load(cls, path, index, people, sources):
+        """
+        Read an oracle written by `save`. `index(person_id)` must map
+        person ids to the row numbers used when it was built.
+
+        Raises ValueError unless the oracle was built from data with
+        `people` people and the source files `sources`: distances from
+        other data are not lower bounds, and A* would return paths that
+        are not the shortest.
+        """
+        with open(path, "rb") as f:
+            preamble = f.read(len(MAGIC) + 8)
+            if not preamble.startswith(MAGIC):
+                raise ValueError(f"{path} is not a landmark file")
+            version, length = struct.unpack("<II", preamble[len(MAGIC):])
+            if version != VERSION:
+                raise ValueError(f"{path} has unsupported version {version}")
+            header = json.loads(f.read(length).decode("utf-8"))
+            if header["people"] != people or header["sources"] != sources:
+                raise ValueError(f"{path} was built from other data")
+            distances = []
+            for _ in header["landmarks"]:
+                row = array("B")
+                row.fromfile(f, header["people"])
+                distances.append(row)
+        return cls(header["landmarks"], distances, index, sources)
+
+    def save(self, path):
+        header = json.dumps({
+            "landmarks": self.landmarks,
+            "people": len(self.distances[0]) if self.distances else 0,
+            "sources": self.sources,
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC + struct.pack("<II", VERSION, len(header)) + header)
+            for row in self.distances:
+                row.tofile(f)
+
+    def bounds(self, a, b):
+        """
+        Returns (lower, upper) bounds on the degrees of separation
+        between person ids `a` and `b`. Both are None if a landmark
+        proves they are not connected; upper is None if no landmark
+        reaches both of them.
+        """
+        if a == b:
+            return 0, 0
+        i, j = self.index(a), self.index(b)
+        lower, upper = 1, None
+        if i is None or j is None:
+            return lower, upper
+        for row in self.distances:
+            da, db = row[i], row[j]
+            if (da == UNREACHABLE) != (db == UNREACHABLE):
+                return None, None
+            if da == UNREACHABLE:
+                continue
+            lower = max(lower, abs(da - db))
+            if upper is None or da + db < upper:
+                upper = da + db
+        return lower, upper
+
+    def lower_bound(self, a, b):
+        """
+        Returns a lower bound on the degrees between `a` and `b`, for
+        use as an A* heuristic. Returns None if they are not connected.
+        """
+        return self.bounds(a, b)[0]
+
+
+def distances_from(source, neighbors, index):
+    """
+    Returns an array of the degrees of separation between `source`
+    and every person in `index`.
+    """
+    distances = array("B", [UNREACHABLE]) * len(index)
+    distances[index[source]] = 0
+    frontier = [source]
+    depth = 0
+    while frontier and depth + 1 < UNREACHABLE:
+        depth += 1
+        next_frontier = []
+        for person_id in frontier:
+            for _, neighbor in neighbors(person_id):
+                i = index[neighbor]
+                if distances[i] == UNREACHABLE:
+                    distances[i] = depth
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return distances
@@ -0,0 +1,60 @@
+import csv
+import io
+import os
+from itertools import islice
+from operator import itemgetter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Buffer size used when reading a CSV file
+CHUNK_SIZE = 1 << 22
+
+# Rows parsed between two progress reports
+BATCH_ROWS = 1 << 16
+
+
+def read_columns(path, columns, progress=None):
+    """
+    Stream the rows of the CSV file at `path`, yielding a tuple of the
+    values in `columns` for each row.
+
+    The file is read through a CHUNK_SIZE buffer and parsed in batches
+    of BATCH_ROWS rows, keeping only the requested fields, so no per-row
+    dictionaries are created. After each batch,
+    `progress(path, bytes_read, total_bytes)` is called if given.
+    """
+    total = os.path.getsize(path)
+    with open(path, "rb", buffering=CHUNK_SIZE) as raw:
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8",
+                                             newline=""))
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = [header.index(column) for column in columns]
+        if len(fields) == 1:
+            get = lambda row: (row[fields[0]],)
+        else:
+            get = itemgetter(*fields)
+
+        while True:
+            batch = list(islice(reader, BATCH_ROWS))
+            if not batch:
+                break
+            yield from map(get, filter(None, batch))
+            if progress is not None:
+                progress(path, raw.tell(), total)
+
+
+def peak_memory():
+    """
+    Returns the peak resident set size of this process in bytes,
+    or None where the platform does not report it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
@@ -0,0 +1,154 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# Most trigram posting list entries read by one search, however common
+# the query's trigrams
+POSTING_BUDGET = 2000
+
+# Number of trigram candidates kept for exact scoring
+CANDIDATES = 50
+
+
+class NameIndex():
+    """
+    Trigram and prefix index over person names, for ranked fuzzy and
+    prefix search.
+
+    Names are normalized with `normalize` into `keys`, and `order` is
+    the permutation of people sorting their keys, which answers prefix
+    queries by binary search. Trigram postings are kept in CSR form:
+    `grams` is the sorted list of padded trigrams, and the people whose
+    name contains `grams[g]` are
+    `gram_people[gram_offsets[g]:gram_offsets[g + 1]]`, in order.
+    All of these are flat sequences, so the index can be stored in the
+    snapshot written by `cache.save` and memory-mapped back.
+    """
+
+    def __init__(self, person_ids, person_names, person_births, keys, order,
+                 grams, gram_offsets, gram_people):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.keys = keys
+        self.order = order
+        self.grams = grams
+        self.gram_offsets = gram_offsets
+        self.gram_people = gram_people
+
+    @classmethod
+    def build(cls, person_ids, person_names, person_births):
+        """
+        Build the index over the given person columns.
+        """
+        keys = [normalize(name) for name in person_names]
+        order = array("i", sorted(range(len(keys)), key=keys.__getitem__))
+
+        postings = {}
+        for person, key in enumerate(keys):
+            for gram in trigrams(key):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(person)
+
+        grams = sorted(postings)
+        gram_offsets = array("q", [0])
+        gram_people = array("i")
+        for gram in grams:
+            gram_people.extend(postings[gram])
+            gram_offsets.append(len(gram_people))
+        return cls(person_ids, person_names, person_births, keys, order,
+                   grams, gram_offsets, gram_people)
+
+    def posting(self, gram):
+        """
+        Returns the people whose name contains `gram`, or None if nobody's
+        does.
+        """
+        grams = self.grams
+        g = bisect_left(grams, gram)
+        if g == len(grams) or grams[g] != gram:
+            return None
+        return self.gram_people[self.gram_offsets[g]:self.gram_offsets[g + 1]]
+
+    def search(self, query, k=5):
+        """
+        Returns up to `k` (person_id, name, birth, score) tuples for the
+        names closest to `query`, best first.
+
+        Exact matches score 1, names starting with the query score
+        between 0.9 and 1, and every other name scores its trigram
+        Dice coefficient with the query.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        scores = {}
+
+        # Key of every person scored, each decoded from `keys` only once
+        found = {}
+
+        # Names starting with the query
+        keys = self.keys
+        order = self.order
+        i = bisect_left(order, query, key=keys.__getitem__)
+        while i < len(order) and len(scores) < CANDIDATES:
+            person = order[i]
+            key = keys[person]
+            if not key.startswith(query):
+                break
+            found[person] = key
+            scores[person] = 0.9 + 0.1 * len(query) / len(key)
+            i += 1
+
+        # Names sharing the most trigrams, reading rare trigrams first
+        grams = trigrams(query)
+        postings = sorted(
+            (posting for posting in map(self.posting, grams)
+             if posting is not None),
+            key=len
+        )
+        shared = Counter()
+        counted = 0
+        for posting in postings:
+            if counted >= POSTING_BUDGET:
+                break
+            posting = posting[:POSTING_BUDGET - counted]
+            counted += len(posting)
+            shared.update(posting)
+        for person, _ in shared.most_common(CANDIDATES):
+            if person not in scores:
+                found[person] = keys[person]
+                scores[person] = dice(grams, trigrams(found[person]))
+
+        ranked = sorted(scores, key=lambda person: (-scores[person],
+                                                    found[person]))
+        return [
+            (self.person_ids[person], self.person_names[person],
+             self.person_births[person], scores[person])
+            for person in ranked[:k]
+        ]
+
+
+def normalize(name):
+    """
+    Lowercase `name` and collapse runs of whitespace.
+    """
+    return " ".join(name.lower().split())
+
+
+def trigrams(key):
+    """
+    Returns the set of trigrams of `key`, padded so that the start and
+    end of the name form trigrams of their own.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a, b):
+    """
+    Returns the Dice coefficient of sets `a` and `b`.
+    """
+    return 2 * len(a & b) / (len(a) + len(b))
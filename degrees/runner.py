@@ -0,0 +1,167 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import degrees
+from util import TreeCache
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer a file of degrees queries in parallel.")
+    parser.add_argument("directory", help="dataset directory")
+    parser.add_argument("queries",
+                        help="CSV file with one 'source,target' name pair "
+                             "per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument("--backend", choices=["dict", "compact"],
+                        default="compact",
+                        help="in-memory representation of the graph")
+    parser.add_argument("--algorithm", choices=sorted(degrees.ALGORITHMS),
+                        default="bidirectional",
+                        help="search used to find each path")
+    parser.add_argument("--landmarks", metavar="FILE",
+                        help="landmark distances, required by the astar "
+                             "algorithm")
+    parser.add_argument("--disambiguate", choices=["best", "none"],
+                        default="none",
+                        help="how to resolve names matching several people, "
+                             "or nobody exactly")
+    parser.add_argument("--cache-budget", type=float, default=256,
+                        help="memory budget in MB of each worker's search "
+                             "tree cache, used by the cached algorithm")
+    parser.add_argument("--output",
+                        help="file to write per-query results to as JSON "
+                             "lines (default: standard output)")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(args.directory, args.backend)
+    print("Data loaded.", file=sys.stderr)
+    degrees.path_cache = TreeCache(degrees.neighbors_for_person,
+                                   budget=int(args.cache_budget * 2 ** 20),
+                                   entry_bytes=degrees.tree_entry_bytes())
+    if args.landmarks:
+        try:
+            degrees.load_landmarks(args.directory, args.landmarks)
+        except ValueError as e:
+            sys.exit(f"{e}; rebuild it with --build-landmarks.")
+    elif args.algorithm == "astar":
+        sys.exit("--landmarks is required for the astar algorithm.")
+    if args.disambiguate == "best":
+        # Build the fuzzy index before forking so workers share it
+        degrees.build_name_index()
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [row for row in csv.reader(f) if len(row) == 2]
+
+    output = (open(args.output, "w", encoding="utf-8") if args.output
+              else sys.stdout)
+    try:
+        summary = run(queries, args.algorithm, args.disambiguate,
+                      args.workers, output)
+    finally:
+        if args.output:
+            output.close()
+    report(summary)
+
+
+def run(queries, algorithm, disambiguate, workers, output):
+    """
+    Answer `queries`, a list of (source name, target name) pairs, across
+    `workers` forked processes and write one JSON result per query to
+    `output`. Names are resolved with the `disambiguate` policy of
+    degrees.person_id_for_name. Returns a summary of latencies and
+    throughput.
+
+    The graph must already be loaded. Workers are forked after loading,
+    so they share it copy-on-write instead of each parsing the data.
+    Only a graph memory-mapped from the snapshot is never written to;
+    a CompactGraph built from CSV still holds Python strings, whose
+    reference counts change as they are read, copying their pages.
+    """
+    jobs = [
+        (source, target, algorithm, disambiguate)
+        for source, target in queries
+    ]
+    latencies = []
+    caches = {}
+    start = time.perf_counter()
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        for result in pool.imap_unordered(answer, jobs, chunksize=16):
+            latencies.append(result["latency"])
+            worker = result.pop("worker")
+            if "cache" in result:
+                caches[worker] = result.pop("cache")
+            output.write(json.dumps(result) + "\n")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": len(jobs),
+        "workers": workers,
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "cache": {
+            counter: sum(stats[counter] for stats in caches.values())
+            for counter in ["hits", "misses", "evictions"]
+        },
+    }
+
+
+def answer(job):
+    """
+    Resolve both names of a query and find the path between them,
+    timing the whole query. With the "cached" algorithm the worker's
+    cache statistics are returned too.
+    """
+    source_name, target_name, algorithm, disambiguate = job
+    start = time.perf_counter()
+    result = {"source": source_name, "target": target_name}
+
+    source = degrees.person_id_for_name(source_name, disambiguate)
+    target = degrees.person_id_for_name(target_name, disambiguate)
+    if source is None or target is None:
+        result["error"] = "person not found or ambiguous"
+    else:
+        path = degrees.ALGORITHMS[algorithm](source, target)
+        result["degrees"] = None if path is None else len(path)
+        result["path"] = path
+
+    result["latency"] = time.perf_counter() - start
+    result["worker"] = os.getpid()
+    if algorithm == "cached":
+        result["cache"] = degrees.path_cache.stats()
+    return result
+
+
+def report(summary):
+    """
+    Print aggregate latency and throughput figures to standard error.
+    """
+    latencies = sorted(summary["latencies"])
+    print(f"{summary['queries']} queries on {summary['workers']} workers "
+          f"in {summary['elapsed']:.2f} s "
+          f"({summary['queries'] / summary['elapsed']:.1f} queries/s)",
+          file=sys.stderr)
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        print(f"latency: mean {statistics.mean(latencies) * 1e3:.2f} ms, "
+              f"median {statistics.median(latencies) * 1e3:.2f} ms, "
+              f"p95 {p95 * 1e3:.2f} ms, max {latencies[-1] * 1e3:.2f} ms",
+              file=sys.stderr)
+    cache = summary["cache"]
+    if cache["hits"] or cache["misses"]:
+        print(f"cache: {cache['hits']} hits, {cache['misses']} misses, "
+              f"{cache['evictions']} evictions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
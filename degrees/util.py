@@ -1,3 +1,7 @@
+import sys
+from collections import OrderedDict, deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -36,3 +40,187 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class DequeStackFrontier():
+    """
+    StackFrontier backed by a deque, plus a count of the states it
+    holds, so that every operation takes constant time.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.pop()
+            self.discard(node.state)
+            return node
+
+    def discard(self, state):
+        count = self.states[state] - 1
+        if count == 0:
+            del self.states[state]
+        else:
+            self.states[state] = count
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.popleft()
+            self.discard(node.state)
+            return node
+
+
+class BFSTree():
+    """
+    Breadth-first search tree rooted at `source`, grown only as far as
+    needed to answer the paths asked of it.
+
+    `neighbors(state)` returns the (action, state) pairs reachable from
+    `state`. `parents` maps every reached state to the (action, parent)
+    step that first reached it, or None for the source.
+    """
+
+    def __init__(self, source, neighbors):
+        self.source = source
+        self.neighbors = neighbors
+        self.parents = {source: None}
+        self.frontier = deque([source])
+
+    def complete(self):
+        return len(self.frontier) == 0
+
+    def expand(self):
+        state = self.frontier.popleft()
+        for action, neighbor in self.neighbors(state):
+            if neighbor not in self.parents:
+                self.parents[neighbor] = (action, state)
+                self.frontier.append(neighbor)
+
+    def path_to(self, target):
+        """
+        Returns the list of (action, state) pairs leading from the
+        source to `target`, or None if `target` is unreachable.
+        """
+        while target not in self.parents and not self.complete():
+            self.expand()
+        if target not in self.parents:
+            return None
+        path = []
+        while self.parents[target] is not None:
+            action, parent = self.parents[target]
+            path.append((action, target))
+            target = parent
+        path.reverse()
+        return path
+
+
+class TreeCache():
+    """
+    LRU cache of BFSTree objects keyed by their source, answering path
+    queries by walking the cached parent pointers.
+
+    `budget` bounds the estimated memory, in bytes, of all cached trees.
+    When a query pushes the total over it, least recently used trees are
+    evicted first. `entry_bytes` is the estimated memory of one entry
+    of a tree's parents beyond the dictionary itself: by default just
+    its (action, parent) tuple, as when `neighbors` returns states and
+    actions that are already held elsewhere.
+    """
+
+    # Estimated size of one (action, parent) tuple in a tree's parents
+    ENTRY_BYTES = sys.getsizeof((None, None))
+
+    def __init__(self, neighbors, budget=256 * 2 ** 20,
+                 entry_bytes=ENTRY_BYTES):
+        self.neighbors = neighbors
+        self.budget = budget
+        self.entry_bytes = entry_bytes
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, source, target):
+        """
+        Returns the shortest list of (action, state) pairs from `source`
+        to `target`, or None if they are not connected.
+
+        A cached tree rooted at either end counts as a hit; a tree rooted
+        at the target answers the query by reversing its path.
+        """
+        if source in self.trees:
+            self.hits += 1
+            tree = self.use(source)
+            path = tree.path_to(target)
+        elif target in self.trees:
+            self.hits += 1
+            tree = self.use(target)
+            path = tree.path_to(source)
+            if path is not None:
+                path = reverse_path(path, target)
+        else:
+            self.misses += 1
+            tree = BFSTree(source, self.neighbors)
+            self.trees[source] = tree
+            path = tree.path_to(target)
+        self.evict()
+        return path
+
+    def use(self, source):
+        self.trees.move_to_end(source)
+        return self.trees[source]
+
+    def evict(self):
+        while self.trees and self.size() > self.budget:
+            self.trees.popitem(last=False)
+            self.evictions += 1
+
+    def size(self):
+        """
+        Returns the estimated memory, in bytes, of all cached trees.
+        """
+        return sum(
+            sys.getsizeof(tree.parents) + sys.getsizeof(tree.frontier)
+            + len(tree.parents) * self.entry_bytes
+            for tree in self.trees.values()
+        )
+
+    def stats(self):
+        return {
+            "trees": len(self.trees),
+            "bytes": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def reverse_path(path, start):
+    """
+    Reverse a list of (action, state) pairs leading from `start`, so
+    that it leads from its last state back to `start`.
+    """
+    states = [start] + [state for _, state in path]
+    return [
+        (path[i][0], states[i])
+        for i in range(len(path) - 1, -1, -1)
+    ]
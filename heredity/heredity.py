@@ -1,7 +1,13 @@
+import argparse
 import csv
 import itertools
-import sys
 import random
+import sys
+from functools import partial
+
+import inference
+import sampling
+import vectorized
 
 PROBS = {
 
@@ -39,11 +45,52 @@ PROBS = {
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for a family.")
+    parser.add_argument("data", help="CSV file of name, mother, father, trait")
+    parser.add_argument("--engine", choices=list(ENGINES) + SAMPLERS,
+                        default="enumerate",
+                        help="enumerate every assignment, one at a time "
+                             "or in vectorized blocks, run exact variable "
+                             "elimination, or pass messages over the "
+                             "pedigree (belief propagation or a junction "
+                             "tree); or estimate by likelihood weighting "
+                             "or Gibbs sampling")
+    parser.add_argument("--target-se", type=float, default=sampling.TARGET_SE,
+                        help="standard error at which sampling stops")
+    parser.add_argument("--max-samples", type=int,
+                        default=sampling.MAX_SAMPLES,
+                        help="samples drawn before sampling gives up on "
+                             "the target")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="worker processes used for sampling")
+    parser.add_argument("--seed", type=int,
+                        help="seed of the random numbers used for sampling")
+    args = parser.parse_args()
+    people = load_data(args.data)
+    try:
+        vectorized.parents_first(people)
+    except ValueError as e:
+        sys.exit(f"{args.data}: {e}")
+
+    if args.engine in SAMPLERS:
+        probabilities = sampling.sample_probabilities(
+            people, PROBS, args.engine, processes=args.processes,
+            seed=args.seed, target=args.target_se,
+            max_samples=args.max_samples)
+    else:
+        probabilities = ENGINES[args.engine](people)
+
+    # Print results
+    print_probabilities(probabilities)
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+
+def enumerate_probabilities(people):
+    """
+    Compute every person's gene and trait distribution by summing the
+    joint probability of every assignment consistent with the evidence,
+    reporting how many were visited on stderr.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -61,32 +108,69 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
+    # Sum the joint probability of every assignment that can occur
+    visited = 0
+    for one_gene, two_genes, have_trait in assignments(people):
+        p = joint_probability(people, one_gene, two_genes, have_trait)
+        update(probabilities, one_gene, two_genes, have_trait, p)
+        visited += 1
+    print(f"Visited {visited} assignments", file=sys.stderr)
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+def assignments(people):
+    """
+    Lazily yield every (one_gene, two_genes, have_trait) assignment that
+    agrees with the known traits and has a non-zero joint probability.
 
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
+    People are assigned one at a time, parents before their children,
+    so only the current partial assignment is kept in memory. Known
+    traits are fixed rather than enumerated, and a branch is cut as
+    soon as a person's gene count or trait is impossible given what
+    is already assigned.
+    """
+    order = vectorized.parents_first(people)
+    genes = {}
+    have_trait = set()
 
-    # Print results
-    for person in people:
+    def extend(i):
+        if i == len(order):
+            one_gene = {p for p in genes if genes[p] == 1}
+            two_genes = {p for p in genes if genes[p] == 2}
+            yield one_gene, two_genes, set(have_trait)
+            return
+        person = order[i]
+        mother, father = people[person]["mother"], people[person]["father"]
+        known = people[person]["trait"]
+        for g in (0, 1, 2):
+            if mother and father:
+                p = inference.inheritance(g, genes[mother], genes[father],
+                                          PROBS["mutation"])
+            else:
+                p = PROBS["gene"][g]
+            if p == 0:
+                continue
+            genes[person] = g
+            for trait in ((True, False) if known is None else (known,)):
+                if PROBS["trait"][g][trait] == 0:
+                    continue
+                if trait:
+                    have_trait.add(person)
+                yield from extend(i + 1)
+                have_trait.discard(person)
+        del genes[person]
+
+    yield from extend(0)
+
+
+def print_probabilities(probabilities):
+    """
+    Print each person's gene and trait distributions.
+    """
+    for person in probabilities:
         print(f"{person}:")
         for field in probabilities[person]:
             print(f"  {field.capitalize()}:")
@@ -250,5 +334,19 @@ def normalize(probabilities):
             probabilities[person]["trait"][j] /= tsum
 
 
+# Inference engines selectable with --engine, each mapping the people
+# from load_data to their gene and trait distributions
+ENGINES = {
+    "enumerate": enumerate_probabilities,
+    "elimination": partial(inference.marginals, probs=PROBS),
+    "propagation": partial(inference.propagate, probs=PROBS),
+    "vectorized": partial(vectorized.enumerate_probabilities, probs=PROBS),
+}
+
+
+# Sampling methods selectable with --engine
+SAMPLERS = ["likelihood", "gibbs"]
+
+
 if __name__ == "__main__":
     main()
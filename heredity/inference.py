@@ -0,0 +1,462 @@
+import itertools
+
+# Values a gene variable can take: copies of the gene
+GENES = (0, 1, 2)
+
+
+class Factor():
+    """
+    A table of non-negative values over some gene variables.
+
+    `variables` is a tuple of person names, and `table` maps every
+    tuple of gene counts, one per variable, to its value.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+    def multiply(self, other):
+        """
+        Returns the product of this factor and `other`, over the union
+        of their variables.
+        """
+        variables = self.variables + tuple(
+            v for v in other.variables if v not in self.variables
+        )
+        left = [variables.index(v) for v in self.variables]
+        right = [variables.index(v) for v in other.variables]
+        table = {}
+        for values in itertools.product(GENES, repeat=len(variables)):
+            a = self.table[tuple(values[i] for i in left)]
+            b = other.table[tuple(values[i] for i in right)]
+            table[values] = a * b
+        return Factor(variables, table)
+
+    def project(self, variables):
+        """
+        Returns this factor summed down to `variables`, in that order.
+        """
+        positions = [self.variables.index(v) for v in variables]
+        table = {}
+        for values, p in self.table.items():
+            key = tuple(values[i] for i in positions)
+            table[key] = table.get(key, 0) + p
+        return Factor(variables, table)
+
+    def normalized(self):
+        """
+        Returns this factor scaled to sum to 1.
+        """
+        total = sum(self.table.values())
+        return Factor(self.variables,
+                      {values: p / total for values, p in self.table.items()})
+
+    def sum_out(self, variable):
+        """
+        Returns this factor with `variable` summed out.
+        """
+        i = self.variables.index(variable)
+        table = {}
+        for values, p in self.table.items():
+            key = values[:i] + values[i + 1:]
+            table[key] = table.get(key, 0) + p
+        return Factor(self.variables[:i] + self.variables[i + 1:], table)
+
+
+def compile_factors(people, probs):
+    """
+    Compile a family, as loaded by `load_data`, into one factor per
+    person over the gene variables of that person and their parents.
+
+    Each factor is the probability of the person's gene count given
+    their parents' (or unconditionally, for people without parents),
+    times the probability of their trait if it is known. Unknown traits
+    sum out to 1 and are left out of the graph.
+    """
+    factors = []
+    for person, data in people.items():
+        mother, father = data["mother"], data["father"]
+        if mother and father:
+            variables = (person, mother, father)
+            table = {
+                (g, m, f): inheritance(g, m, f, probs["mutation"])
+                for g, m, f in itertools.product(GENES, repeat=3)
+            }
+        else:
+            variables = (person,)
+            table = {(g,): probs["gene"][g] for g in GENES}
+
+        if data["trait"] is not None:
+            for values in table:
+                table[values] *= probs["trait"][values[0]][data["trait"]]
+        factors.append(Factor(variables, table))
+    return factors
+
+
+def compile_couples(people, probs):
+    """
+    Compile a family into a factor graph in which every couple with
+    children is a single variable, whose values are the (mother,
+    father) pairs of gene counts.
+
+    With `compile_factors` any two siblings share both parents and form
+    a loop. Here children hang off their parents' couple variable,
+    which is tied to each parent by a factor that is 1 where the pair
+    agrees with that parent's gene count, so the graph only has loops
+    where the pedigree itself does. Returns the factors and a dictionary
+    mapping every variable to the values it can take.
+    """
+    factors = []
+    domains = {person: GENES for person in people}
+    for person, data in people.items():
+        mother, father = data["mother"], data["father"]
+        if mother and father:
+            couple = ("couple", mother, father)
+            if couple not in domains:
+                domains[couple] = tuple(itertools.product(GENES, repeat=2))
+                for i, parent in enumerate((mother, father)):
+                    factors.append(Factor((couple, parent), {
+                        (pair, g): float(pair[i] == g)
+                        for pair in domains[couple] for g in GENES
+                    }))
+            variables = (person, couple)
+            table = {
+                (g, pair): inheritance(g, *pair, probs["mutation"])
+                for g in GENES for pair in domains[couple]
+            }
+        else:
+            variables = (person,)
+            table = {(g,): probs["gene"][g] for g in GENES}
+
+        if data["trait"] is not None:
+            for values in table:
+                table[values] *= probs["trait"][values[0]][data["trait"]]
+        factors.append(Factor(variables, table))
+    return factors, domains
+
+
+def inheritance(child, mother, father, mutation):
+    """
+    Returns the probability that a child gets `child` copies of the
+    gene from parents with `mother` and `father` copies.
+    """
+    m = passes_on(mother, mutation)
+    f = passes_on(father, mutation)
+    return {
+        2: m * f,
+        1: m * (1 - f) + f * (1 - m),
+        0: (1 - m) * (1 - f),
+    }[child]
+
+
+def passes_on(genes, mutation):
+    """
+    Returns the probability that a parent with `genes` copies of the
+    gene passes one on.
+    """
+    return {0: mutation, 1: 0.5, 2: 1 - mutation}[genes]
+
+
+def min_fill_order(factors, keep=()):
+    """
+    Returns an elimination order for every variable of `factors` not in
+    `keep`, choosing each time the variable whose elimination adds the
+    fewest edges between its neighbours in the interaction graph. Ties
+    go to the variable with fewer neighbours, then by name.
+    """
+    return min_fill(factors, keep)[0]
+
+
+def min_fill(factors, keep=()):
+    """
+    Returns a min-fill elimination order, as `min_fill_order` does, and
+    the clique each variable forms with its neighbours when eliminated.
+    """
+    neighbors = {}
+    for factor in factors:
+        for v in factor.variables:
+            neighbors.setdefault(v, set()).update(factor.variables)
+            neighbors[v].discard(v)
+
+    order = []
+    cliques = []
+    remaining = set(neighbors) - set(keep)
+    while remaining:
+        variable = min(remaining, key=lambda v: (
+            fill_in(neighbors, v), len(neighbors[v]), v
+        ))
+        adjacent = neighbors.pop(variable)
+        for v in adjacent:
+            neighbors[v].discard(variable)
+            neighbors[v].update(adjacent - {v})
+        remaining.remove(variable)
+        order.append(variable)
+        cliques.append({variable} | adjacent)
+    return order, cliques
+
+
+def fill_in(neighbors, variable):
+    """
+    Returns how many edges eliminating `variable` would add.
+    """
+    adjacent = list(neighbors[variable])
+    return sum(
+        1 for a, b in itertools.combinations(adjacent, 2)
+        if b not in neighbors[a]
+    )
+
+
+def eliminate(factors, order):
+    """
+    Sum the variables in `order` out of `factors`, one at a time, and
+    return the product of the factors left.
+    """
+    factors = list(factors)
+    for variable in order:
+        involved = [f for f in factors if variable in f.variables]
+        factors = [f for f in factors if variable not in f.variables]
+        product = involved[0]
+        for factor in involved[1:]:
+            product = product.multiply(factor)
+        factors.append(product.sum_out(variable))
+
+    result = factors[0]
+    for factor in factors[1:]:
+        result = result.multiply(factor)
+    return result
+
+
+def marginals(people, probs):
+    """
+    Compute every person's gene and trait distribution given the known
+    traits, by variable elimination with a min-fill order.
+
+    Returns a dictionary in the format built by `heredity.main`:
+    person -> {"gene": {2: p, 1: p, 0: p}, "trait": {True: p, False: p}}.
+    A known trait has probability 1; an unknown one is the sum over
+    gene counts g of P(g | evidence) * P(trait | g).
+    """
+    factors = compile_factors(people, probs)
+    genes = {}
+    for person in people:
+        result = eliminate(factors, min_fill_order(factors, keep=[person]))
+        genes[person] = {g: result.table[(g,)] for g in GENES}
+    return distributions(people, probs, genes)
+
+
+def propagate(people, probs):
+    """
+    Compute every person's gene and trait distribution, as `marginals`
+    does, in one pass of message passing.
+
+    If the couple graph from `compile_couples` is a forest, as it is
+    for any pedigree without loops, sum-product belief propagation
+    over it is exact and linear in the number of people. Otherwise,
+    for instance after a marriage between relatives, messages are
+    passed over a junction tree of the cliques of a min-fill
+    elimination instead.
+    """
+    factors, domains = compile_couples(people, probs)
+    if is_forest(factors):
+        genes = belief_propagation(factors, domains)
+    else:
+        genes = junction_tree(compile_factors(people, probs))
+    return distributions(people, probs, genes)
+
+
+def distributions(people, probs, genes):
+    """
+    Returns the `marginals` dictionary for gene distributions `genes`,
+    mapping each person to unnormalized weights of 0, 1 and 2 copies.
+    """
+    probabilities = {}
+    for person, data in people.items():
+        total = sum(genes[person].values())
+        gene = {g: genes[person][g] / total for g in (2, 1, 0)}
+
+        if data["trait"] is None:
+            trait = {
+                t: sum(gene[g] * probs["trait"][g][t] for g in GENES)
+                for t in (True, False)
+            }
+        else:
+            trait = {t: float(t == data["trait"]) for t in (True, False)}
+        probabilities[person] = {"gene": gene, "trait": trait}
+    return probabilities
+
+
+def is_forest(factors):
+    """
+    Returns whether the factor graph of `factors`, linking each factor
+    to its variables, has no cycles.
+    """
+    variables = {v for factor in factors for v in factor.variables}
+    edges = sum(len(factor.variables) for factor in factors)
+    components = len(connected_components(factors))
+    return edges == len(factors) + len(variables) - components
+
+
+def connected_components(factors):
+    """
+    Returns the sets of factor indexes whose factors are connected
+    through shared variables.
+    """
+    containing = {}
+    for i, factor in enumerate(factors):
+        for v in factor.variables:
+            containing.setdefault(v, []).append(i)
+
+    components = []
+    seen = set()
+    for i in range(len(factors)):
+        if i in seen:
+            continue
+        component = {i}
+        stack = [i]
+        while stack:
+            for v in factors[stack.pop()].variables:
+                for j in containing[v]:
+                    if j not in component:
+                        component.add(j)
+                        stack.append(j)
+        seen |= component
+        components.append(component)
+    return components
+
+
+def belief_propagation(factors, domains):
+    """
+    Run sum-product belief propagation on a factor graph that is a
+    forest and return the marginal of every variable, whose values are
+    listed in `domains`.
+
+    Every component is rooted at one of its factors. Messages are sent
+    towards the root, then back out, so that each edge carries one
+    message each way. Messages are normalized to avoid underflow.
+    """
+    neighbors = {}
+    for i, factor in enumerate(factors):
+        neighbors[("factor", i)] = [("variable", v) for v in factor.variables]
+        for v in factor.variables:
+            neighbors.setdefault(("variable", v), []).append(("factor", i))
+
+    # Order the nodes of every component so that parents come first
+    order = []
+    parent = {}
+    for component in connected_components(factors):
+        root = ("factor", min(component))
+        parent[root] = None
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for neighbor in neighbors[node]:
+                if neighbor != parent[node]:
+                    parent[neighbor] = node
+                    stack.append(neighbor)
+
+    messages = {}
+
+    def belief(node, exclude=None):
+        # Product of the messages into a variable, except from `exclude`
+        result = {x: 1 for x in domains[node[1]]}
+        for other in neighbors[node]:
+            if other != exclude:
+                message = messages[(other, node)]
+                result = {x: p * message[x] for x, p in result.items()}
+        return result
+
+    def send(source, target):
+        if source[0] == "variable":
+            message = belief(source, exclude=target)
+        else:
+            factor = factors[source[1]]
+            position = factor.variables.index(target[1])
+            others = [
+                (factor.variables.index(other[1]), messages[(other, source)])
+                for other in neighbors[source] if other != target
+            ]
+            message = {x: 0 for x in domains[target[1]]}
+            for values, p in factor.table.items():
+                for i, m in others:
+                    p *= m[values[i]]
+                message[values[position]] += p
+        total = sum(message.values())
+        messages[(source, target)] = {x: p / total for x, p in message.items()}
+
+    for node in reversed(order):
+        if parent[node] is not None:
+            send(node, parent[node])
+    for node in order:
+        for neighbor in neighbors[node]:
+            if neighbor != parent[node]:
+                send(node, neighbor)
+
+    return {
+        node[1]: belief(node) for node in neighbors if node[0] == "variable"
+    }
+
+
+def junction_tree(factors):
+    """
+    Compute the marginal of every variable of `factors` by message
+    passing over a junction tree.
+
+    The cliques are those formed by a min-fill elimination of all
+    variables. The clique of each variable is linked to the clique of
+    the first of its neighbours eliminated after it, which satisfies
+    the running intersection property. Each factor is multiplied into
+    the clique of its first eliminated variable.
+    """
+    order, cliques = min_fill(factors)
+    position = {v: i for i, v in enumerate(order)}
+    cliques = [tuple(sorted(clique, key=position.get)) for clique in cliques]
+    parent = [
+        min((position[v] for v in clique[1:]), default=None)
+        for clique in cliques
+    ]
+
+    potentials = [
+        Factor(clique, {
+            values: 1 for values in itertools.product(GENES,
+                                                      repeat=len(clique))
+        })
+        for clique in cliques
+    ]
+    for factor in factors:
+        first = min(position[v] for v in factor.variables)
+        potentials[first] = potentials[first].multiply(factor)
+
+    children = [[] for _ in cliques]
+    for i, j in enumerate(parent):
+        if j is not None:
+            children[j].append(i)
+
+    messages = {}
+
+    def send(source, target):
+        belief = potentials[source]
+        for other in children[source] + [parent[source]]:
+            if other is not None and other != target:
+                belief = belief.multiply(messages[(other, source)])
+        separator = tuple(v for v in cliques[source] if v in cliques[target])
+        messages[(source, target)] = belief.project(separator).normalized()
+
+    # Cliques are numbered in elimination order, so children come first
+    for i, j in enumerate(parent):
+        if j is not None:
+            send(i, j)
+    for i in reversed(range(len(cliques))):
+        for child in children[i]:
+            send(i, child)
+
+    genes = {}
+    for i, variable in enumerate(order):
+        belief = potentials[i]
+        for other in children[i] + [parent[i]]:
+            if other is not None:
+                belief = belief.multiply(messages[(other, i)])
+        marginal = belief.project((variable,))
+        genes[variable] = {g: marginal.table[(g,)] for g in GENES}
+    return genes
@@ -0,0 +1,297 @@
+import multiprocessing
+import sys
+
+import numpy as np
+
+from vectorized import Family, log_tables
+
+# Samples drawn by every job of a round
+SAMPLES = 10000
+
+# Independent jobs per round, each giving one estimate of every marginal
+JOBS = 8
+
+# Largest standard error of any marginal at which sampling stops
+TARGET_SE = 0.005
+
+# Samples drawn in total before giving up on the target
+MAX_SAMPLES = 10000000
+
+# Gibbs chains advanced together by one job, and the sweeps they make
+# before their first round is counted
+CHAINS = 100
+BURN_IN = 100
+
+
+class Pedigree(Family):
+    """
+    A Family with the links the samplers walk: for every person
+    `as_mother` and `as_father` list the children they are mother or
+    father of.
+    """
+
+    def __init__(self, people):
+        super().__init__(people)
+        n = len(self)
+        self.mother = np.full(n, -1)
+        self.father = np.full(n, -1)
+        self.mother[self.children] = self.mothers
+        self.father[self.children] = self.fathers
+        self.as_mother = [np.flatnonzero(self.mother == i) for i in range(n)]
+        self.as_father = [np.flatnonzero(self.father == i) for i in range(n)]
+
+
+def sample_probabilities(people, probs, method="likelihood", samples=SAMPLES,
+                         jobs=JOBS, processes=1, seed=None, target=TARGET_SE,
+                         max_samples=MAX_SAMPLES):
+    """
+    Estimate every person's gene and trait distribution by sampling,
+    with `method` "likelihood" (likelihood weighting) or "gibbs".
+
+    Sampling runs in rounds of `jobs` independent jobs of `samples`
+    samples each, spread over `processes` worker processes. Every job
+    gets its own random stream spawned from `seed`, so results do not
+    depend on the number of processes. After each round the standard
+    error of every marginal is estimated from the spread of the jobs'
+    estimates, and sampling stops once the largest is below `target`
+    or `max_samples` samples were drawn. The samples drawn and largest
+    standard error are reported on stderr.
+
+    Returns a dictionary in the format of `heredity.enumerate_probabilities`.
+    """
+    pedigree = Pedigree(people)
+    tables = log_tables(probs)
+    seeds = np.random.SeedSequence(seed)
+    states = [None] * jobs
+
+    if processes == 1:
+        init_worker(pedigree, tables)
+        pool = None
+        run = map
+    else:
+        pool = multiprocessing.Pool(processes, initializer=init_worker,
+                                    initargs=(pedigree, tables))
+        run = pool.map
+
+    estimates = []
+    log_weights = []
+    drawn = 0
+    try:
+        while True:
+            round_jobs = [(samples, child, state)
+                          for child, state in zip(seeds.spawn(jobs), states)]
+            round_results = list(run(JOB_FUNCTIONS[method], round_jobs))
+            for estimate, log_weight, _ in round_results:
+                estimates.append(estimate)
+                log_weights.append(log_weight)
+            states = [state for _, _, state in round_results]
+            drawn += jobs * samples
+
+            estimate, error, effective = combine(estimates, log_weights)
+            if ((error.max() < target and effective >= jobs)
+                    or drawn >= max_samples):
+                break
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(f"Drew {drawn} samples, largest standard error "
+          f"{error.max():.4f}", file=sys.stderr)
+    return probabilities(pedigree, estimate)
+
+
+def combine(estimates, log_weights):
+    """
+    Combine the jobs' estimates, weighted by the total weight of each
+    job's samples given as its logarithm, into one estimate.
+
+    Returns the estimate, the standard error of each entry, from the
+    weighted spread of the jobs' estimates around it, and the effective
+    number of jobs, which is small when a few jobs hold nearly all the
+    weight and the standard error cannot be trusted.
+    """
+    estimates = np.array(estimates)
+    log_weights = np.array(log_weights)
+    weights = np.exp(log_weights - log_weights.max())
+    weights /= weights.sum()
+    estimate = weights @ estimates
+
+    jobs = len(weights)
+    if jobs < 2:
+        return estimate, np.full_like(estimate, np.inf), jobs
+    variance = (jobs / (jobs - 1)
+                * (weights ** 2) @ (estimates - estimate) ** 2)
+    return estimate, np.sqrt(variance), 1 / (weights ** 2).sum()
+
+
+def probabilities(pedigree, estimate):
+    """
+    Returns the `heredity` probability dictionary for an estimate, the
+    flattened (n, 3) gene distributions followed by the n trait
+    probabilities.
+    """
+    n = len(pedigree)
+    genes = estimate[:3 * n].reshape(n, 3)
+    traits = estimate[3 * n:]
+    result = {}
+    for i, name in enumerate(pedigree.names):
+        result[name] = {
+            "gene": {g: float(genes[i, g]) for g in (2, 1, 0)},
+            "trait": {True: float(traits[i]), False: 1 - float(traits[i])},
+        }
+    return result
+
+
+def summarize(pedigree, tables, genes):
+    """
+    Returns one flat estimate from (n, 3) gene distributions: the
+    distributions followed by each person's probability of the trait,
+    1 or 0 where the trait is known and P(trait | gene) averaged over
+    the gene distribution otherwise.
+    """
+    traits = genes @ np.exp(tables[2][:, 1])
+    known = pedigree.known
+    traits[known] = pedigree.traits[known]
+    return np.concatenate([genes.ravel(), traits])
+
+
+# Pedigree and log tables of a pool worker, set by init_worker
+worker_pedigree = None
+worker_tables = None
+
+
+def init_worker(pedigree, tables):
+    global worker_pedigree, worker_tables
+    worker_pedigree = pedigree
+    worker_tables = tables
+
+
+def likelihood_weighting(job):
+    """
+    Draw `samples` gene assignments for the whole family at once, each
+    person from their prior or their parents' genes, weight each by the
+    probability of the known traits, and return the weighted gene
+    distributions as one estimate.
+    """
+    samples, seed, _ = job
+    pedigree, tables = worker_pedigree, worker_tables
+    gene, inherit, trait = tables
+    rng = np.random.default_rng(seed)
+
+    genes = np.empty((samples, len(pedigree)), dtype=np.int64)
+    for i in pedigree.order:
+        if pedigree.mother[i] < 0:
+            log_p = np.broadcast_to(gene, (samples, 3))
+        else:
+            log_p = inherit[:, genes[:, pedigree.mother[i]],
+                            genes[:, pedigree.father[i]]].T
+        genes[:, i] = draw(rng, np.exp(log_p))
+
+    known = np.flatnonzero(pedigree.known)
+    log_w = trait[genes[:, known], pedigree.traits[known]].sum(axis=1)
+    weights = np.exp(log_w - log_w.max())
+
+    # Weighted count of each gene count for every person
+    n = len(pedigree)
+    counts = np.bincount((genes + 3 * np.arange(n)).ravel(),
+                         weights=np.repeat(weights, n), minlength=3 * n)
+    estimate = summarize(pedigree, tables, counts.reshape(n, 3) / weights.sum())
+    return estimate, log_w.max() + np.log(weights.sum()), None
+
+
+def gibbs(job):
+    """
+    Advance CHAINS Gibbs chains over the family's gene counts by
+    `samples` samples in total, resampling one person at a time from
+    their distribution given everyone else and the known traits.
+
+    Chains start from `state`, the state returned by the job of the
+    previous round, or from a sample of the prior followed by BURN_IN
+    uncounted sweeps. The estimate averages every conditional
+    distribution drawn from (Rao-Blackwellization), rather than the
+    draws themselves. All jobs carry the same weight.
+    """
+    samples, seed, state = job
+    pedigree = worker_pedigree
+    rng = np.random.default_rng(seed)
+    if state is None:
+        state = prior_sample(rng, CHAINS)
+        for _ in range(BURN_IN):
+            sweep(rng, state)
+
+    sums = np.zeros((len(pedigree), 3))
+    sweeps = max(1, samples // CHAINS)
+    for _ in range(sweeps):
+        sums += sweep(rng, state)
+    estimate = summarize(pedigree, worker_tables, sums / (sweeps * CHAINS))
+    return estimate, 0.0, state
+
+
+def prior_sample(rng, chains):
+    """
+    Returns `chains` gene assignments drawn from the prior, ignoring
+    the known traits.
+    """
+    pedigree = worker_pedigree
+    gene, inherit, _ = worker_tables
+    genes = np.empty((chains, len(pedigree)), dtype=np.int64)
+    for i in pedigree.order:
+        if pedigree.mother[i] < 0:
+            log_p = np.broadcast_to(gene, (chains, 3))
+        else:
+            log_p = inherit[:, genes[:, pedigree.mother[i]],
+                            genes[:, pedigree.father[i]]].T
+        genes[:, i] = draw(rng, np.exp(log_p))
+    return genes
+
+
+def sweep(rng, genes):
+    """
+    Resample every person of every chain in `genes` once, in place.
+    Returns the sum over chains of each person's conditional gene
+    distribution, as an (n, 3) array.
+    """
+    pedigree = worker_pedigree
+    gene, inherit, trait = worker_tables
+    sums = np.zeros((len(pedigree), 3))
+    values = np.arange(3)[None, :]
+    for i in pedigree.order:
+        if pedigree.mother[i] < 0:
+            log_p = np.broadcast_to(gene, (len(genes), 3)).copy()
+        else:
+            log_p = inherit[:, genes[:, pedigree.mother[i]],
+                            genes[:, pedigree.father[i]]].T.copy()
+        if pedigree.known[i]:
+            log_p += trait[:, pedigree.traits[i]]
+
+        # Each child's gene count given this person's candidate values
+        for child in pedigree.as_mother[i]:
+            father = genes[:, pedigree.father[child], None]
+            log_p += inherit[genes[:, child, None], values, father]
+        for child in pedigree.as_father[i]:
+            mother = genes[:, pedigree.mother[child], None]
+            log_p += inherit[genes[:, child, None], mother, values]
+
+        p = np.exp(log_p - log_p.max(axis=1, keepdims=True))
+        p /= p.sum(axis=1, keepdims=True)
+        sums[i] = p.sum(axis=0)
+        genes[:, i] = draw(rng, p)
+    return sums
+
+
+def draw(rng, p):
+    """
+    Returns one draw of 0, 1 or 2 per row of `p`, a (k, 3) array of
+    probabilities, or of weights proportional to them.
+    """
+    cumulative = p.cumsum(axis=1)
+    u = rng.random(len(p)) * cumulative[:, -1]
+    return (u[:, None] >= cumulative[:, :-1]).sum(axis=1)
+
+
+# Job run by each method
+JOB_FUNCTIONS = {
+    "likelihood": likelihood_weighting,
+    "gibbs": gibbs,
+}
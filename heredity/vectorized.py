@@ -0,0 +1,179 @@
+import numpy as np
+
+# Number of people whose gene counts vary within one block of
+# assignments, 3 ** 10 assignments per block
+BLOCK_DIGITS = 10
+
+
+class Family():
+    """
+    A family from `load_data` encoded as integer arrays.
+
+    People are numbered in the order of `names`. `founders` lists the
+    people without parents, and `children`, `mothers` and `fathers` the
+    others together with their parents. `known` marks people whose
+    trait is given, with the given traits in `traits`. `order` lists
+    everyone with parents before their children.
+    """
+
+    def __init__(self, people):
+        self.names = list(people)
+        index = {name: i for i, name in enumerate(self.names)}
+        self.order = [index[name] for name in parents_first(people)]
+        has_parents = [
+            bool(people[name]["mother"] and people[name]["father"])
+            for name in self.names
+        ]
+        self.founders = np.array(
+            [i for i, parents in enumerate(has_parents) if not parents],
+            dtype=np.int64)
+        self.children = np.array(
+            [i for i, parents in enumerate(has_parents) if parents],
+            dtype=np.int64)
+        self.mothers = np.array(
+            [index[people[self.names[i]]["mother"]] for i in self.children],
+            dtype=np.int64)
+        self.fathers = np.array(
+            [index[people[self.names[i]]["father"]] for i in self.children],
+            dtype=np.int64)
+        self.known = np.array(
+            [people[name]["trait"] is not None for name in self.names])
+        self.traits = np.array(
+            [int(bool(people[name]["trait"])) for name in self.names])
+
+    def __len__(self):
+        return len(self.names)
+
+
+def parents_first(people):
+    """
+    Returns the names in `people` ordered so that parents come before
+    their children.
+
+    Raises ValueError if some people cannot be placed, because a parent
+    is missing from `people` or people are their own ancestors.
+    """
+    order = []
+    placed = set()
+    while len(order) < len(people):
+        before = len(order)
+        for person, data in people.items():
+            if person in placed:
+                continue
+            parents = [data["mother"], data["father"]]
+            if all(parent is None or parent in placed for parent in parents):
+                order.append(person)
+                placed.add(person)
+        if len(order) == before:
+            unplaced = [person for person in people if person not in placed]
+            raise ValueError("parents missing or cyclic for: "
+                             + ", ".join(unplaced))
+    return order
+
+
+def log_tables(probs):
+    """
+    Returns PROBS as log-probability arrays: the unconditional gene
+    distribution indexed [g], the inheritance table indexed
+    [child, mother, father], and the trait table indexed [g, trait].
+    """
+    gene = np.log([probs["gene"][g] for g in range(3)])
+
+    passes = np.array([probs["mutation"], 0.5, 1 - probs["mutation"]])
+    m = passes[None, :, None]
+    f = passes[None, None, :]
+    inherit = np.concatenate([
+        (1 - m) * (1 - f),
+        m * (1 - f) + f * (1 - m),
+        m * f,
+    ])
+
+    trait = np.log([[probs["trait"][g][t] for t in (False, True)]
+                    for g in range(3)])
+    return gene, np.log(inherit), trait
+
+
+def genotypes(n, digits=None):
+    """
+    Yield every assignment of 0, 1 or 2 copies of the gene to `n`
+    people as blocks of a (3 ** k, n) array, k = min(n, digits).
+
+    Person j's gene count is digit j of the assignment number in base
+    3. The k lowest digits run through all their values in every block
+    and are copied from a table built once; the rest are constant
+    within a block, so no block needs any division.
+    """
+    k = min(n, BLOCK_DIGITS if digits is None else digits)
+    low = (np.arange(3 ** k)[:, None] // 3 ** np.arange(k) % 3)
+    genes = np.empty((3 ** k, n), dtype=np.int64)
+    genes[:, :k] = low
+    for high in range(3 ** (n - k)):
+        genes[:, k:] = [high // 3 ** j % 3 for j in range(n - k)]
+        yield genes
+
+
+def joint_log_probabilities(family, tables, genes):
+    """
+    Returns the log joint probability of every assignment of gene
+    counts, one per row of `genes`, and of the known traits, as
+    `joint_probability` computes it for a single assignment with the
+    unknown traits summed out.
+    """
+    gene, inherit, trait = tables
+    known = np.flatnonzero(family.known)
+    return (
+        gene[genes[:, family.founders]].sum(axis=1)
+        + inherit[genes[:, family.children], genes[:, family.mothers],
+                  genes[:, family.fathers]].sum(axis=1)
+        + trait[genes[:, known], family.traits[known]].sum(axis=1)
+    )
+
+
+def enumerate_probabilities(people, probs, digits=None):
+    """
+    Compute every person's gene and trait distribution by enumerating
+    all 3 ** n assignments of gene counts, a block at a time, and
+    summing their joint probabilities with the known traits.
+
+    This gives the same distributions as `heredity.enumerate_probabilities`,
+    which also enumerates the unknown traits; here those are summed out
+    in closed form, as each only depends on its own person's genes.
+    Probabilities are summed in log space: each block's weights are
+    taken relative to the largest log probability seen so far, and the
+    running sums are rescaled whenever it grows, so that large families
+    do not underflow.
+    """
+    family = Family(people)
+    n = len(family)
+    tables = log_tables(probs)
+    offsets = 3 * np.arange(n)
+
+    reference = -np.inf
+    gene_sums = np.zeros(3 * n)
+    for genes in genotypes(n, digits):
+        log_p = joint_log_probabilities(family, tables, genes)
+        highest = log_p.max()
+        if highest > reference:
+            gene_sums *= np.exp(reference - highest)
+            reference = highest
+        weights = np.exp(log_p - reference)
+
+        # Add each assignment's weight to the gene count of every person
+        gene_sums += np.bincount((genes + offsets).ravel(),
+                                 weights=np.repeat(weights, n),
+                                 minlength=3 * n)
+
+    gene_sums = gene_sums.reshape(n, 3)
+    gene_sums /= gene_sums.sum(axis=1, keepdims=True)
+    trait_true = gene_sums @ np.exp(tables[2][:, 1])
+    probabilities = {}
+    for i, name in enumerate(family.names):
+        if family.known[i]:
+            trait = {t: float(t == family.traits[i]) for t in (True, False)}
+        else:
+            trait = {True: trait_true[i], False: 1 - trait_true[i]}
+        probabilities[name] = {
+            "gene": {g: gene_sums[i, g] for g in (2, 1, 0)},
+            "trait": trait,
+        }
+    return probabilities